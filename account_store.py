@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class AccountStore:
+    # Accounts from a JSON file, held in memory and reloaded only when the
+    # file's mtime or size changes. Writes take an exclusive lock file and
+    # replace the JSON atomically, so concurrent registrations (threads or
+    # processes) cannot lose each other's updates.
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path):
+        # One shared store per file, so every User/Credentials object in a
+        # process reuses the same parsed accounts.
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(path)
+            return cls._instances[key]
+
+
+
+    def __init__(self, path):
+        self.path = path
+        self._accounts = {}
+        self._signature = None
+        self._lock = threading.RLock()
+
+
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+
+    def _refresh(self, force = False):
+        signature = self._stat_signature()
+        if not force and signature == self._signature:
+            return
+        try:
+            with open(self.path, 'r') as file:
+                accounts = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            accounts = {}
+        self._accounts = accounts
+        self._signature = signature
+
+
+
+    def get(self, name):
+        with self._lock:
+            self._refresh()
+            return self._accounts.get(name)
+
+
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._accounts)
+
+
+
+    def add(self, name, record):
+        with self._lock, self._file_lock():
+            # Re-read under the lock: another process may have just written.
+            self._refresh(force = True)
+            if name in self._accounts:
+                return False
+
+            accounts = dict(self._accounts)
+            accounts[name] = record
+            self._write(accounts)
+            self._accounts = accounts
+            self._signature = self._stat_signature()
+            return True
+
+
+
+    def _write(self, accounts):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir = directory, prefix = ".tmp-", suffix = ".json")
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(accounts, file, indent = 4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.path + ".lock", 'a+') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+
+
+class SqliteAccountStore:
+    # Same interface as AccountStore, backed by an indexed SQLite table.
+    # If the table is empty and `seed_path` names an existing JSON account
+    # file, its accounts are copied in on first use.
+    def __init__(self, db_name, table = "users", seed_path = None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name '{table}'")
+        self.table = table
+        self.conn = sqlite3.connect(db_name, check_same_thread = False, timeout = 5)
+        self._lock = threading.Lock()
+
+        with self._lock, self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    username TEXT PRIMARY KEY,
+                    password TEXT NOT NULL
+                )
+            """)
+            empty = self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+            if empty and seed_path and os.path.exists(seed_path):
+                seed = AccountStore(seed_path).all()
+                self.conn.executemany(f"INSERT OR IGNORE INTO {table} (username, password) VALUES (?, ?)",
+                                      [(name, record["password"]) for name, record in seed.items()])
+
+
+
+    def get(self, name):
+        with self._lock:
+            row = self.conn.execute(f"SELECT username, password FROM {self.table} WHERE username = ?",
+                                    (name,)).fetchone()
+        if row is None:
+            return None
+        return {"username": row[0], "password": row[1]}
+
+
+
+    def all(self):
+        with self._lock:
+            rows = self.conn.execute(f"SELECT username, password FROM {self.table}").fetchall()
+        return {name: {"username": name, "password": password} for name, password in rows}
+
+
+
+    def add(self, name, record):
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(f"INSERT INTO {self.table} (username, password) VALUES (?, ?)",
+                                  (name, record["password"]))
+            return True
+        except sqlite3.IntegrityError:
+            return False
@@ -1,392 +1,663 @@
-import streamlit as st
-import pandas as pd
-import io
-from database import Database
-from student import Student
-from chatbot import Chatbot
-from credentials import Credentials
-from user import User
-
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-if 'user_type' not in st.session_state:
-    st.session_state.user_type = None
-if 'username' not in st.session_state:
-    st.session_state.username = None
-
-@st.cache_resource
-def init_components():
-    db = Database()
-    chatbot = Chatbot(db)
-    credentials = Credentials()
-    user_manager = User()
-    return db, chatbot, credentials, user_manager
-
-db, chatbot, credentials, user_manager = init_components()
-
-def login_page():
-    st.title("🎓 Student Database Management System")
-    st.markdown("---")
-    
-    tab1, tab2 = st.tabs(["Login", "Register"])
-    
-    with tab1:
-        st.header("Login")
-        
-        user_type = st.selectbox("Login as:", ["Admin", "User"])
-        username = st.text_input("Username")
-        password = st.text_input("Password", type="password")
-        
-        if st.button("Login", type="primary"):
-            if username and password:
-                if user_type == "Admin":
-                    if credentials.authenticate_credentials(username, password):
-                        st.session_state.logged_in = True
-                        st.session_state.user_type = "Admin"
-                        st.session_state.username = username
-                        st.success("Admin login successful!")
-                        st.rerun()
-                    else:
-                        st.error("Invalid admin credentials!")
-                else:
-                    if user_manager.authenticate_user(username, password):
-                        st.session_state.logged_in = True
-                        st.session_state.user_type = "User"
-                        st.session_state.username = username
-                        st.success("User login successful!")
-                        st.rerun()
-                    else:
-                        st.error("Invalid user credentials!")
-            else:
-                st.error("Please enter both username and password!")
-    
-    with tab2:
-        st.header("Register New User")
-        
-        new_username = st.text_input("Choose Username", key="reg_username")
-        new_password = st.text_input("Choose Password", type="password", key="reg_password")
-        confirm_password = st.text_input("Confirm Password", type="password", key="reg_confirm")
-        
-        if st.button("Register", type="primary"):
-            if new_username and new_password and confirm_password:
-                if new_password == confirm_password:
-                    result = user_manager.store_users(new_username, new_password)
-                    if result is not False:
-                        st.success("Registration successful! You can now login.")
-                        st.balloons()
-                    else:
-                        st.error("Username already exists. Please choose a different one.")
-                else:
-                    st.error("Passwords do not match!")
-            else:
-                st.error("Please fill in all fields!")
-
-def admin_dashboard():
-    st.title(f"👨‍💼 Admin Dashboard - Welcome {st.session_state.username}!")
-    st.markdown("---")
-    
-    with st.sidebar:
-        st.header("Admin Menu")
-        menu_option = st.selectbox(
-            "Choose Action:",
-            ["View Students", "Add Student", "Update Student", "Delete Student", "Bulk Upload", "Chatbot"]
-        )
-        
-        if st.button("Logout"):
-            st.session_state.logged_in = False
-            st.session_state.user_type = None
-            st.session_state.username = None
-            st.rerun()
-    
-    if menu_option == "View Students":
-        view_students()
-    elif menu_option == "Add Student":
-        add_student()
-    elif menu_option == "Update Student":
-        update_student()
-    elif menu_option == "Delete Student":
-        delete_student()
-    elif menu_option == "Bulk Upload":
-        bulk_upload()
-    elif menu_option == "Chatbot":
-        chatbot_interface()
-
-def user_dashboard():
-    st.title(f"👨‍🎓 User Dashboard - Welcome {st.session_state.username}!")
-    st.markdown("---")
-    
-    with st.sidebar:
-        st.header("User Menu")
-        menu_option = st.selectbox(
-            "Choose Action:",
-            ["Chatbot", "View My Info"]
-        )
-        
-        if st.button("Logout"):
-            st.session_state.logged_in = False
-            st.session_state.user_type = None
-            st.session_state.username = None
-            st.rerun()
-    
-    if menu_option == "Chatbot":
-        chatbot_interface()
-    elif menu_option == "View My Info":
-        st.info("📊 Access student information through the chatbot!")
-        st.markdown("""
-        **Available chatbot commands:**
-        - "list students" - View all students
-        - "count students" - Get total number of students
-        - "find student [name]" - Search for a specific student
-        - "help" - Get list of available commands
-        """)
-
-def view_students():
-    st.header("📋 All Students")
-    
-    students = db.fetch_students()
-    
-    if students:
-        df = pd.DataFrame(students, columns=['ID', 'Name', 'Age', 'Grade'])
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Students", len(students))
-        with col2:
-            st.metric("Average Age", f"{df['Age'].mean():.1f}")
-        with col3:
-            unique_grades = df['Grade'].nunique()
-            st.metric("Unique Grades", unique_grades)
-        with col4:
-            st.metric("Youngest Student", df['Age'].min())
-        
-        st.dataframe(df, use_container_width=True)
-        
-        csv = df.to_csv(index=False)
-        st.download_button(
-            label="📥 Download as CSV",
-            data=csv,
-            file_name="students.csv",
-            mime="text/csv"
-        )
-    else:
-        st.info("No students found in the database.")
-
-def add_student():
-    st.header("➕ Add New Student")
-    
-    with st.form("add_student_form"):
-        name = st.text_input("Student Name")
-        age = st.number_input("Age", min_value=1, max_value=100, value=18)
-        grade = st.text_input("Grade")
-        
-        submitted = st.form_submit_button("Add Student", type="primary")
-        
-        if submitted:
-            if name and grade:
-                student = Student(name=name, age=age, grade=grade)
-                db.insert_student(student)
-                st.success(f"✅ Student '{name}' added successfully!")
-                st.balloons() # ahm haga
-            else:
-                st.error("Please fill in all required fields!")
-
-def update_student():
-    st.header("✏️ Update Student")
-    
-    students = db.fetch_students()
-    
-    if students:
-        student_options = {f"{s[1]} (ID: {s[0]})": s[0] for s in students}
-        selected_student = st.selectbox("Select Student to Update:", options=list(student_options.keys()))
-        
-        if selected_student:
-            student_id = student_options[selected_student]
-            current_student = db.fetch_student(student_id=student_id)[0]
-            
-            st.write(f"**Current Information:** ID: {current_student[0]}, Name: {current_student[1]}, Age: {current_student[2]}, Grade: {current_student[3]}")
-            
-            with st.form("update_student_form"):
-                new_name = st.text_input("New Name", value=current_student[1])
-                new_age = st.number_input("New Age", min_value=1, max_value=100, value=current_student[2])
-                new_grade = st.text_input("New Grade", value=current_student[3])
-                
-                submitted = st.form_submit_button("Update Student", type="primary")
-                
-                if submitted:
-                    db.delete_student(student_id)
-                    updated_student = Student(name=new_name, age=new_age, grade=new_grade)
-                    db.insert_student(updated_student)
-                    st.success(f"✅ Student information updated successfully!")
-                    st.rerun()
-    else:
-        st.info("No students available to update.")
-
-def delete_student():
-    st.header("🗑️ Delete Student")
-    
-    students = db.fetch_students()
-    
-    if students:
-        student_options = {f"{s[1]} (ID: {s[0]})": s[0] for s in students}
-        selected_student = st.selectbox("Select Student to Delete:", options=list(student_options.keys()))
-        
-        if selected_student:
-            student_id = student_options[selected_student]
-            current_student = db.fetch_student(student_id=student_id)[0]
-            
-            st.warning(f"⚠️ You are about to delete: **{current_student[1]}** (ID: {current_student[0]})")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("🗑️ Confirm Delete", type="primary"):
-                    db.delete_student(student_id)
-                    st.success(f"✅ Student '{current_student[1]}' deleted successfully!")
-                    st.rerun()
-            with col2:
-                if st.button("❌ Cancel"):
-                    st.info("Delete operation cancelled.")
-    else:
-        st.info("No students available to delete.")
-
-def bulk_upload():
-    st.header("📤 Bulk Upload Students")
-    st.markdown("Upload a CSV file with columns: **Name**, **Age**, **Grade**")
-    
-    with st.expander("📋 View Sample CSV Format"):
-        sample_data = pd.DataFrame({
-            'Name': ['Ahmed Ali', 'Sara Mohamed', 'Omar Hassan'],
-            'Age': [20, 19, 21],
-            'Grade': ['A', 'B+', 'A-']
-        })
-        st.dataframe(sample_data)
-        
-        sample_csv = sample_data.to_csv(index=False)
-        st.download_button(
-            label="📥 Download Sample CSV",
-            data=sample_csv,
-            file_name="sample_students.csv",
-            mime="text/csv"
-        )
-    
-    uploaded_file = st.file_uploader("Choose CSV file", type="csv")
-    
-    if uploaded_file is not None:
-        try:
-            df = pd.read_csv(uploaded_file)
-            
-            required_columns = ['Name', 'Age', 'Grade']
-            if all(col in df.columns for col in required_columns):
-                st.write("📋 Preview of uploaded data:")
-                st.dataframe(df)
-                
-                if st.button("🚀 Upload All Students", type="primary"):
-                    success_count = 0
-                    error_count = 0
-                    
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    for index, row in df.iterrows():
-                        try:
-                            student = Student(name=row['Name'], age=int(row['Age']), grade=row['Grade'])
-                            db.insert_student(student)
-                            success_count += 1
-                        except Exception as e:
-                            error_count += 1
-                            st.error(f"Error adding {row['Name']}: {str(e)}")
-                        
-                        progress = (index + 1) / len(df)
-                        progress_bar.progress(progress)
-                        status_text.text(f"Processing: {index + 1}/{len(df)}")
-                    
-                    st.success(f"✅ Bulk upload completed! Added: {success_count}, Errors: {error_count}")
-                    if success_count > 0:
-                        st.balloons()
-            else:
-                st.error(f"❌ CSV must contain columns: {', '.join(required_columns)}")
-                st.write("Your CSV columns:", list(df.columns))
-                
-        except Exception as e:
-            st.error(f"❌ Error reading CSV file: {str(e)}")
-
-def chatbot_interface():
-    st.header("🤖 Student Information Chatbot")
-    st.markdown("Ask me about student information! Try commands like 'list students', 'count students', or 'find student [name]'")
-    
-    if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
-    
-    chat_container = st.container()
-    with chat_container:
-        for chat in st.session_state.chat_history:
-            with st.chat_message("user"):
-                st.write(chat["user"])
-            with st.chat_message("assistant"):
-                st.write(chat["bot"])
-    
-    user_input = st.chat_input("Type your question here...")
-    
-    if user_input:
-        bot_response = chatbot.respond(user_input)
-        
-        st.session_state.chat_history.append({
-            "user": user_input,
-            "bot": bot_response
-        })
-        
-        st.rerun()
-    
-    if st.button("🗑️ Clear Chat History"):
-        st.session_state.chat_history = []
-        st.rerun()
-    
-    with st.expander("❓ Available Commands"):
-        st.markdown("""
-        - **"list students"** - Display all students in the database
-        - **"count students"** - Show total number of students
-        - **"find student [name]"** - Search for a specific student by name
-        - **"help"** - Show available commands
-        
-        **Example queries:**
-        - "list students"
-        - "how many students are there?"
-        - "find student Ahmed"
-        """)
-
-def main():
-    st.set_page_config(
-        page_title="Student Database Management System",
-        page_icon="🎓",
-        layout="wide",
-        initial_sidebar_state="expanded"
-    )
-    
-    st.markdown("""
-        <style>
-        .main-header {
-            background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-            padding: 1rem;
-            border-radius: 10px;
-            color: white;
-            text-align: center;
-            margin-bottom: 2rem;
-        }
-        .metric-card {
-            background: #f0f2f6;
-            padding: 1rem;
-            border-radius: 10px;
-            border-left: 4px solid #667eea;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    if not st.session_state.logged_in:
-        login_page()
-    else:
-        if st.session_state.user_type == "Admin":
-            admin_dashboard()
-        else:
-            user_dashboard()
-
-if __name__ == "__main__":
+import streamlit as st
+import io
+import os
+import shutil
+import tempfile
+import uuid
+from database import Database
+from student import Student
+from chatbot import Chatbot
+from credentials import Credentials
+from user import User
+from profiling import PageProfiler
+from db_service import SERVICE_ENV, SERVICE_KEY_ENV
+
+# pandas, the CSV importer and the instrumentation are imported by the
+# pages that use them, so a rerun of any other page does not wait on them.
+
+if 'logged_in' not in st.session_state:
+    st.session_state.logged_in = False
+if 'user_type' not in st.session_state:
+    st.session_state.user_type = None
+if 'username' not in st.session_state:
+    st.session_state.username = None
+
+SLOW_QUERY_MS = 100
+DOWNLOAD_ROW_LIMIT = 100_000
+
+@st.cache_resource
+def init_components():
+    if os.environ.get(SERVICE_ENV):
+        # Several app processes share one database service; see db_service.py.
+        from db_service import RemoteDatabase
+        db = RemoteDatabase(os.environ[SERVICE_ENV], authkey=os.environ[SERVICE_KEY_ENV].encode())
+    else:
+        from instrumentation import QueryStats
+        query_stats = QueryStats(slow_ms=SLOW_QUERY_MS, log_path="slow_queries.log")
+        db = Database(query_stats=query_stats)
+    chatbot = Chatbot(db)
+    credentials = Credentials()
+    user_manager = User()
+    return db, chatbot, credentials, user_manager
+
+if os.environ.get(SERVICE_ENV) and not os.environ.get(SERVICE_KEY_ENV):
+    st.error(f"{SERVICE_ENV} is set but {SERVICE_KEY_ENV} is not. "
+             f"Set {SERVICE_KEY_ENV} to the key the database service was started with.")
+    st.stop()
+
+db, chatbot, credentials, user_manager = init_components()
+
+@st.cache_resource
+def init_importer():
+    # The upload validator needs pandas; built on the first Bulk Upload.
+    from importer import CSVImporter
+    from upload_validator import UploadValidator
+    return CSVImporter(db, validator=UploadValidator(db))
+
+def profile_session_id():
+    if 'profile_session' not in st.session_state:
+        st.session_state.profile_session = uuid.uuid4().hex[:12]
+    return st.session_state.profile_session
+
+@st.cache_resource
+def init_profiler():
+    # Off unless STUDENT_DB_PROFILE=1; see profiling.py.
+    return PageProfiler.from_env(query_stats=db.query_stats, session_id=profile_session_id)
+
+profiler = init_profiler()
+
+PREVIEW_ROWS = 10
+SELECTOR_LIMIT = 20
+
+def login_page():
+    st.title("🎓 Student Database Management System")
+    st.markdown("---")
+    
+    tab1, tab2 = st.tabs(["Login", "Register"])
+    
+    with tab1:
+        st.header("Login")
+        
+        user_type = st.selectbox("Login as:", ["Admin", "User"])
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        
+        if st.button("Login", type="primary"):
+            if username and password:
+                if user_type == "Admin":
+                    if credentials.authenticate_credentials(username, password):
+                        st.session_state.logged_in = True
+                        st.session_state.user_type = "Admin"
+                        st.session_state.username = username
+                        st.success("Admin login successful!")
+                        st.rerun()
+                    else:
+                        st.error("Invalid admin credentials!")
+                else:
+                    if user_manager.authenticate_user(username, password):
+                        st.session_state.logged_in = True
+                        st.session_state.user_type = "User"
+                        st.session_state.username = username
+                        st.success("User login successful!")
+                        st.rerun()
+                    else:
+                        st.error("Invalid user credentials!")
+            else:
+                st.error("Please enter both username and password!")
+    
+    with tab2:
+        st.header("Register New User")
+        
+        new_username = st.text_input("Choose Username", key="reg_username")
+        new_password = st.text_input("Choose Password", type="password", key="reg_password")
+        confirm_password = st.text_input("Confirm Password", type="password", key="reg_confirm")
+        
+        if st.button("Register", type="primary"):
+            if new_username and new_password and confirm_password:
+                if new_password == confirm_password:
+                    result = user_manager.store_users(new_username, new_password)
+                    if result is not False:
+                        st.success("Registration successful! You can now login.")
+                        st.balloons()
+                    else:
+                        st.error("Username already exists. Please choose a different one.")
+                else:
+                    st.error("Passwords do not match!")
+            else:
+                st.error("Please fill in all fields!")
+
+def admin_dashboard():
+    st.title(f"👨‍💼 Admin Dashboard - Welcome {st.session_state.username}!")
+    st.markdown("---")
+    
+    with st.sidebar:
+        st.header("Admin Menu")
+        menu_option = st.selectbox(
+            "Choose Action:",
+            ["View Students", "Add Student", "Update Student", "Delete Student", "Bulk Upload", "Chatbot",
+             "Performance"]
+        )
+        
+        if st.button("Logout"):
+            st.session_state.logged_in = False
+            st.session_state.user_type = None
+            st.session_state.username = None
+            st.rerun()
+    
+    if menu_option == "View Students":
+        view_students()
+    elif menu_option == "Add Student":
+        add_student()
+    elif menu_option == "Update Student":
+        update_student()
+    elif menu_option == "Delete Student":
+        delete_student()
+    elif menu_option == "Bulk Upload":
+        bulk_upload()
+    elif menu_option == "Chatbot":
+        chatbot_interface()
+    elif menu_option == "Performance":
+        performance_page()
+
+def user_dashboard():
+    st.title(f"👨‍🎓 User Dashboard - Welcome {st.session_state.username}!")
+    st.markdown("---")
+    
+    with st.sidebar:
+        st.header("User Menu")
+        menu_option = st.selectbox(
+            "Choose Action:",
+            ["Chatbot", "View My Info"]
+        )
+        
+        if st.button("Logout"):
+            st.session_state.logged_in = False
+            st.session_state.user_type = None
+            st.session_state.username = None
+            st.rerun()
+    
+    if menu_option == "Chatbot":
+        chatbot_interface()
+    elif menu_option == "View My Info":
+        st.info("📊 Access student information through the chatbot!")
+        st.markdown("""
+        **Available chatbot commands:**
+        - "list students" - View all students
+        - "count students" - Get total number of students
+        - "find student [name]" - Search for a specific student
+        - "help" - Get list of available commands
+        """)
+
+@profiler.page
+def view_students():
+    st.header("📋 All Students")
+    
+    stats = db.stats()
+    
+    if stats["count"]:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Students", stats["count"])
+        with col2:
+            average_age = stats["average_age"]
+            st.metric("Average Age", f"{average_age:.1f}" if average_age is not None else "-")
+        with col3:
+            st.metric("Unique Grades", stats["unique_grades"])
+        with col4:
+            st.metric("Youngest Student", stats["min_age"] if stats["min_age"] is not None else "-")
+        
+        show_student_page()
+        
+        # The export is only built when asked for, not on every rerun.
+        # Streamlit holds a download in memory, so the browser gets at most
+        # DOWNLOAD_ROW_LIMIT students; full dumps go through the CLI.
+        if st.button("📦 Prepare CSV Download"):
+            if stats["count"] > DOWNLOAD_ROW_LIMIT:
+                st.warning(f"The download holds the first {DOWNLOAD_ROW_LIMIT:,} of {stats['count']:,} students. "
+                           "For a full export run `python -m cli export students.csv.gz --format csv.gz`.")
+            csv = b"".join(db.iter_export("csv", limit=DOWNLOAD_ROW_LIMIT))
+            st.download_button(
+                label="📥 Download as CSV",
+                data=csv,
+                file_name="students.csv",
+                mime="text/csv",
+                on_click="ignore"
+            )
+    else:
+        st.info("No students found in the database.")
+
+def show_student_page():
+    import pandas as pd
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        name_filter = st.text_input("Name starts with", key="view_name_filter")
+    with col2:
+        grade_filter = st.text_input("Grade", key="view_grade_filter")
+    with col3:
+        order_by = st.selectbox("Sort by", ["id", "name", "age", "grade"], key="view_order_by")
+    with col4:
+        descending = st.checkbox("Descending", key="view_descending")
+    with col5:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="view_page_size")
+    
+    filters = {"name": name_filter.strip(), "grade": grade_filter.strip()}
+    
+    # Any change to the filters or sort order starts again from page one.
+    view_state = (name_filter, grade_filter, order_by, descending, page_size)
+    if st.session_state.get('view_state') != view_state:
+        st.session_state.view_state = view_state
+        st.session_state.view_cursors = [None]
+    
+    cursors = st.session_state.view_cursors
+    rows, next_cursor = db.fetch_students_page(after=cursors[-1], limit=page_size, order_by=order_by,
+                                               descending=descending, filters=filters)
+    
+    page_df = pd.DataFrame([tuple(s) for s in rows], columns=['ID', 'Name', 'Age', 'Grade'])
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
+    
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("⬅️ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next ➡️", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    with col3:
+        st.caption(f"Page {len(cursors)}")
+
+@profiler.page
+def add_student():
+    st.header("➕ Add New Student")
+    
+    with st.form("add_student_form"):
+        name = st.text_input("Student Name")
+        age = st.number_input("Age", min_value=1, max_value=100, value=18)
+        grade = st.text_input("Grade")
+        
+        submitted = st.form_submit_button("Add Student", type="primary")
+        
+        if submitted:
+            if name and grade:
+                student = Student(name=name, age=age, grade=grade)
+                db.insert_student(student)
+                st.success(f"✅ Student '{name}' added successfully!")
+                st.balloons() # ahm haga
+            else:
+                st.error("Please fill in all required fields!")
+
+def student_selector(label, key):
+    # Bounded search instead of a selectbox holding every student: the
+    # options are at most SELECTOR_LIMIT name-prefix matches, plus the
+    # student with that ID when a number is typed.
+    query = st.text_input(f"Search student to {label.lower()} by name or ID", key=f"{key}_query",
+                          placeholder="Start typing a name, or enter an ID").strip()
+    
+    matches = db.fetch_student(student_id=int(query)) if query.isdigit() and len(query) < 19 else []
+    matched_ids = {s.id for s in matches}
+    matches += [s for s in db.suggest_students(query, limit=SELECTOR_LIMIT) if s.id not in matched_ids]
+    
+    if not matches:
+        st.info("No students match your search.")
+        return None
+    if len(matches) >= SELECTOR_LIMIT:
+        st.caption(f"Showing the first {SELECTOR_LIMIT} matches. Keep typing to narrow them down.")
+    
+    options = {s.id: s for s in matches}
+    selected_id = st.selectbox(f"Select Student to {label}:", options=list(options.keys()),
+                               format_func=lambda student_id: f"{options[student_id].name} (ID: {student_id})",
+                               key=f"{key}_choice")
+    return options.get(selected_id)
+
+@profiler.page
+def update_student():
+    st.header("✏️ Update Student")
+    
+    if db.stats()["count"]:
+        current_student = student_selector("Update", key="update")
+        
+        if current_student:
+            student_id = current_student.id
+            
+            st.write(f"**Current Information:** ID: {current_student.id}, Name: {current_student.name}, Age: {current_student.age}, Grade: {current_student.grade}")
+            
+            with st.form("update_student_form"):
+                new_name = st.text_input("New Name", value=current_student.name)
+                new_age = st.number_input("New Age", min_value=1, max_value=100, value=current_student.age)
+                new_grade = st.text_input("New Grade", value=current_student.grade)
+                
+                submitted = st.form_submit_button("Update Student", type="primary")
+                
+                if submitted:
+                    student = Student(*current_student)
+                    student.update(name=new_name, age=new_age, grade=new_grade)
+                    changes = {field: getattr(student, field)
+                               for field in ("name", "age", "grade")
+                               if getattr(student, field) != getattr(current_student, field)}
+                    if changes:
+                        db.update_student(student_id, **changes)
+                        st.success(f"✅ Student information updated successfully!")
+                        st.rerun()
+                    else:
+                        st.info("No changes to save.")
+    else:
+        st.info("No students available to update.")
+
+@profiler.page
+def delete_student():
+    st.header("🗑️ Delete Student")
+    
+    if 'delete_message' in st.session_state:
+        st.success(st.session_state.pop('delete_message'))
+    
+    if db.stats()["count"]:
+        tab1, tab2, tab3 = st.tabs(["One Student", "Several Students", "By Filter"])
+        with tab1:
+            delete_one_student()
+        with tab2:
+            delete_selected_students()
+        with tab3:
+            delete_filtered_students()
+    else:
+        st.info("No students available to delete.")
+
+def delete_one_student():
+    current_student = student_selector("Delete", key="delete")
+    
+    if current_student:
+        student_id = current_student.id
+        
+        st.warning(f"⚠️ You are about to delete: **{current_student.name}** (ID: {current_student.id})")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🗑️ Confirm Delete", type="primary"):
+                db.delete_student(student_id)
+                st.success(f"✅ Student '{current_student.name}' deleted successfully!")
+                st.rerun()
+        with col2:
+            if st.button("❌ Cancel"):
+                st.info("Delete operation cancelled.")
+
+def delete_selected_students():
+    # Picks accumulate across searches; the chosen students are removed
+    # with one delete_students call, in a single transaction.
+    labels = st.session_state.setdefault('bulk_delete_labels', {})
+    query = st.text_input("Search students by name or ID", key="bulk_delete_query",
+                          placeholder="Start typing a name, or enter an ID").strip()
+    matches = db.fetch_student(student_id=int(query)) if query.isdigit() and len(query) < 19 else []
+    matches += db.suggest_students(query, limit=SELECTOR_LIMIT)
+    labels.update({s.id: f"{s.name} (ID: {s.id})" for s in matches})
+    
+    selected = st.session_state.get('bulk_delete_ids', [])
+    options = list(dict.fromkeys(selected + [s.id for s in matches]))
+    selected = st.multiselect("Students to delete:", options=options, format_func=labels.get, key="bulk_delete_ids")
+    
+    def delete_selected():
+        deleted = db.delete_students(ids=st.session_state.bulk_delete_ids)
+        st.session_state.bulk_delete_ids = []
+        st.session_state.bulk_delete_labels = {}
+        st.session_state.delete_message = f"✅ Deleted {deleted} students."
+    
+    st.button(f"🗑️ Delete {len(selected)} Selected", type="primary", disabled=not selected,
+              on_click=delete_selected)
+
+def delete_filtered_students():
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        name_filter = st.text_input("Name starts with", key="bulk_delete_name")
+    with col2:
+        grade_filter = st.text_input("Grade", key="bulk_delete_grade")
+    with col3:
+        min_age = st.number_input("Min Age", min_value=0, max_value=100, value=0, key="bulk_delete_min_age")
+    with col4:
+        max_age = st.number_input("Max Age", min_value=0, max_value=100, value=100, key="bulk_delete_max_age")
+    
+    filters = {"name": name_filter.strip(), "grade": grade_filter.strip(),
+               "min_age": min_age or None, "max_age": max_age if max_age < 100 else None}
+    if not any(value for value in filters.values()):
+        st.info("Set at least one filter to choose which students to delete.")
+        return
+    
+    matching = db.count_students(filters)
+    st.warning(f"⚠️ {matching} students match these filters.")
+    confirmed = st.checkbox(f"I understand that all {matching} matching students will be deleted",
+                            key="bulk_delete_confirm")
+    
+    def delete_filtered():
+        deleted = db.delete_students(filters=filters)
+        st.session_state.bulk_delete_confirm = False
+        st.session_state.delete_message = f"✅ Deleted {deleted} students."
+    
+    st.button("🗑️ Delete Matching Students", type="primary", disabled=not (confirmed and matching),
+              on_click=delete_filtered)
+
+@profiler.page
+def bulk_upload():
+    import pandas as pd
+    importer = init_importer()
+    st.header("📤 Bulk Upload Students")
+    st.markdown("Upload a CSV file with columns: **Name**, **Age**, **Grade**")
+    
+    with st.expander("📋 View Sample CSV Format"):
+        sample_data = pd.DataFrame({
+            'Name': ['Ahmed Ali', 'Sara Mohamed', 'Omar Hassan'],
+            'Age': [20, 19, 21],
+            'Grade': ['A', 'B+', 'A-']
+        })
+        st.dataframe(sample_data)
+        
+        sample_csv = sample_data.to_csv(index=False)
+        st.download_button(
+            label="📥 Download Sample CSV",
+            data=sample_csv,
+            file_name="sample_students.csv",
+            mime="text/csv"
+        )
+    
+    uploaded_file = st.file_uploader("Choose CSV file", type="csv")
+    
+    if uploaded_file is not None:
+        try:
+            columns, preview_rows = importer.preview(uploaded_file, rows=PREVIEW_ROWS)
+            uploaded_file.seek(0)
+            
+            required_columns = ['Name', 'Age', 'Grade']
+            if all(col in columns for col in required_columns):
+                st.write(f"📋 Preview of uploaded data (first {PREVIEW_ROWS} rows):")
+                preview_rows = [(row + [''] * len(columns))[:len(columns)] for row in preview_rows]
+                st.dataframe(pd.DataFrame(preview_rows, columns=columns))
+                
+                parallel = st.checkbox("⚡ Validate on all CPU cores (for very large files)")
+                
+                if st.button("🚀 Upload All Students", type="primary"):
+                    progress_bar = st.progress(0)
+                    status_text = st.empty()
+                    
+                    def update_progress(result):
+                        position = result.bytes_read if parallel else uploaded_file.tell()
+                        progress_bar.progress(min(position / max(uploaded_file.size, 1), 1.0))
+                        status_text.text(f"Processed: {result.processed} rows")
+                    
+                    with tempfile.TemporaryDirectory() as work_dir:
+                        report_path = os.path.join(work_dir, "errors.csv")
+                        if parallel:
+                            # Worker processes read byte ranges, so they need a real file.
+                            csv_path = os.path.join(work_dir, "upload.csv")
+                            with open(csv_path, 'wb') as file:
+                                shutil.copyfileobj(uploaded_file, file)
+                            result = importer.run_parallel(csv_path, progress=update_progress,
+                                                           error_report=report_path)
+                        else:
+                            result = importer.run(uploaded_file, progress=update_progress,
+                                                  error_report=report_path)
+                        with open(report_path, 'rb') as file:
+                            error_report = file.read()
+                    progress_bar.progress(1.0)
+                    
+                    for line_no, row, error in result.errors[:20]:
+                        st.error(f"Line {line_no}: error adding {row.get('Name') or '?'}: {error}")
+                    if result.rejected > 20:
+                        st.error(f"... and {result.rejected - 20} more errors")
+                    if result.rejected:
+                        st.download_button(
+                            label="📥 Download Error Report",
+                            data=error_report,
+                            file_name="upload_errors.csv",
+                            mime="text/csv",
+                            on_click="ignore"
+                        )
+                    
+                    st.success(f"✅ Bulk upload completed! Added: {result.inserted}, Errors: {result.rejected}")
+                    if result.inserted > 0:
+                        st.balloons()
+            else:
+                st.error(f"❌ CSV must contain columns: {', '.join(required_columns)}")
+                st.write("Your CSV columns:", columns)
+                
+        except Exception as e:
+            st.error(f"❌ Error reading CSV file: {str(e)}")
+
+@profiler.page
+def performance_page():
+    import pandas as pd
+    from instrumentation import HISTOGRAM_BUCKETS_MS
+    st.header("📈 Performance")
+    st.markdown(f"Live counters since the app started (or since the last reset). "
+                f"Statements slower than {SLOW_QUERY_MS} ms are logged to `slow_queries.log`.")
+    
+    snapshot = db.query_stats.snapshot()
+    methods = snapshot["methods"]
+    statements = snapshot["statements"]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Database Calls", sum(m["calls"] for m in methods.values()))
+    with col2:
+        st.metric("SQL Statements Run", sum(s["calls"] for s in statements.values()))
+    with col3:
+        st.metric("Errors", sum(m["errors"] for m in methods.values()))
+    
+    st.subheader("🗂️ Database Methods")
+    if methods:
+        methods_df = pd.DataFrame([
+            {"Method": name, "Calls": m["calls"], "Errors": m["errors"], "Avg (ms)": m["avg_ms"],
+             "Max (ms)": m["max_ms"], "Total (ms)": m["total_ms"]}
+            for name, m in methods.items()
+        ]).sort_values("Total (ms)", ascending=False)
+        st.dataframe(methods_df, use_container_width=True, hide_index=True)
+    else:
+        st.info("No database calls recorded yet.")
+    
+    st.subheader("🧮 SQL Statements")
+    if statements:
+        statements_df = pd.DataFrame([
+            {"Statement": sql, "Calls": s["calls"], "Rows": s["rows"], "Avg (ms)": s["avg_ms"],
+             "Max (ms)": s["max_ms"], "Total (ms)": s["total_ms"]}
+            for sql, s in statements.items()
+        ]).sort_values("Total (ms)", ascending=False)
+        st.dataframe(statements_df, use_container_width=True, hide_index=True)
+        
+        labels = [f"≤ {bound} ms" for bound in HISTOGRAM_BUCKETS_MS] + [f"> {HISTOGRAM_BUCKETS_MS[-1]} ms"]
+        counts = [sum(s["histogram"][i] for s in statements.values()) for i in range(len(labels))]
+        st.write("Statement latency distribution:")
+        st.bar_chart(pd.DataFrame({"Statements": counts}, index=pd.Index(labels, name="Latency")))
+    
+    st.subheader("🐢 Slowest Queries")
+    if snapshot["slowest"]:
+        for entry in snapshot["slowest"]:
+            with st.expander(f"{entry['ms']:.1f} ms · {entry['rows']} rows · {entry['sql'][:80]}"):
+                st.code(entry["sql"], language="sql")
+                st.write(f"**Parameters:** `{entry['params']}`  \n**At:** {entry['at']}")
+                st.write("**Query plan:**")
+                st.code("\n".join(entry["plan"]) or "(no plan)")
+    else:
+        st.info(f"No statement has taken longer than {SLOW_QUERY_MS} ms.")
+    
+    if st.button("🔄 Reset Counters"):
+        db.query_stats.reset()
+        st.rerun()
+
+@profiler.page
+def chatbot_interface():
+    st.header("🤖 Student Information Chatbot")
+    st.markdown("Ask me about student information! Try commands like 'list students', 'count students', or 'find student [name]'")
+    
+    if 'chat_history' not in st.session_state:
+        st.session_state.chat_history = []
+    
+    chat_container = st.container()
+    with chat_container:
+        for chat in st.session_state.chat_history:
+            with st.chat_message("user"):
+                st.write(chat["user"])
+            with st.chat_message("assistant"):
+                st.write(chat["bot"])
+    
+    user_input = st.chat_input("Type your question here...")
+    
+    if user_input:
+        bot_response = chatbot.respond(user_input)
+        
+        st.session_state.chat_history.append({
+            "user": user_input,
+            "bot": bot_response
+        })
+        
+        st.rerun()
+    
+    if st.button("🗑️ Clear Chat History"):
+        st.session_state.chat_history = []
+        st.rerun()
+    
+    with st.expander("❓ Available Commands"):
+        st.markdown("""
+        - **"list students"** - Display all students in the database
+        - **"count students"** - Show total number of students
+        - **"find student [name]"** - Search for a specific student by name
+        - **"help"** - Show available commands
+        
+        **Example queries:**
+        - "list students"
+        - "how many students are there?"
+        - "find student Ahmed"
+        """)
+
+def main():
+    st.set_page_config(
+        page_title="Student Database Management System",
+        page_icon="🎓",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    st.markdown("""
+        <style>
+        .main-header {
+            background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
+            padding: 1rem;
+            border-radius: 10px;
+            color: white;
+            text-align: center;
+            margin-bottom: 2rem;
+        }
+        .metric-card {
+            background: #f0f2f6;
+            padding: 1rem;
+            border-radius: 10px;
+            border-left: 4px solid #667eea;
+        }
+        </style>
+    """, unsafe_allow_html=True)
+    
+    if not st.session_state.logged_in:
+        login_page()
+    else:
+        if st.session_state.user_type == "Admin":
+            admin_dashboard()
+        else:
+            user_dashboard()
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
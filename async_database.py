@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Short lookups and single-row writes share the interactive executor.
+# Anything that can touch the whole table runs on the bulk executor, so a
+# slow export or import never takes the threads lookups are waiting for.
+INTERACTIVE_METHODS = ("fetch_students_page", "fetch_student", "fetch_students_by_ids",
+                       "count_students", "stats", "search_students", "suggest_students", "insert_student",
+                       "update_student", "delete_student", "cache_info", "data_version")
+BULK_METHODS = ("fetch_students", "insert_students", "update_students", "delete_students", "export",
+                "fetch_columns")
+
+
+class AsyncDatabase:
+    # asyncio facade over Database. Every call runs on a worker thread and
+    # accepts an extra `timeout` keyword (seconds). On timeout or
+    # cancellation the SQLite statement the worker is running is
+    # interrupted instead of being left to finish in the background, and a
+    # call still waiting for a connection or the write lock gives up
+    # without running.
+    def __init__(self, database, max_workers = 8, max_bulk_workers = 2, timeout = None):
+        self.db = database
+        self.timeout = timeout
+        self._executors = {
+            "interactive": ThreadPoolExecutor(max_workers, thread_name_prefix = "db"),
+            "bulk": ThreadPoolExecutor(max_bulk_workers, thread_name_prefix = "db-bulk"),
+        }
+
+
+
+    def __getattr__(self, name):
+        if name in INTERACTIVE_METHODS:
+            lane = "interactive"
+        elif name in BULK_METHODS:
+            lane = "bulk"
+        else:
+            raise AttributeError(f"AsyncDatabase has no method '{name}'")
+
+        method = getattr(self.db, name)
+
+        @functools.wraps(method)
+        async def call(*args, timeout = None, **kwargs):
+            return await self.run(lane, method, *args, timeout = timeout, **kwargs)
+
+        return call
+
+
+
+    async def run(self, lane, fn, *args, timeout = None, **kwargs):
+        loop = asyncio.get_running_loop()
+        cancel = threading.Event()
+        # Held while the worker records or clears its thread id, so an
+        # interrupt can only reach the thread while it runs this call.
+        lock = threading.Lock()
+        worker = {}
+
+        def work():
+            with lock:
+                if cancel.is_set():
+                    raise asyncio.CancelledError()
+                worker["thread"] = threading.get_ident()
+            try:
+                # Gives up while still waiting for a connection or the
+                # write lock, not only once its statement runs.
+                with self.db.pool.cancellable(cancel):
+                    return fn(*args, **kwargs)
+            finally:
+                with lock:
+                    worker.pop("thread", None)
+
+        future = loop.run_in_executor(self._executors[lane], work)
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            with lock:
+                cancel.set()
+                if "thread" in worker:
+                    self.db.pool.interrupt(worker["thread"])
+            raise
+
+
+
+    async def iter_students(self, batch_size = 500, filters = None, timeout = None):
+        # Async generator over all students, one keyset page per round trip.
+        # Pages are read uncached so a full scan does not evict the query
+        # cache's hot entries.
+        cursor = None
+        while True:
+            rows, cursor = await self.run("bulk", self.db._fetch_students_page, cursor, batch_size,
+                                          "id", False, filters, None, timeout = timeout)
+            for student in rows:
+                yield student
+            if cursor is None:
+                break
+
+
+
+    def close(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait = False, cancel_futures = True)
+        self.db.close()
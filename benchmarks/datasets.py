@@ -0,0 +1,37 @@
+import json
+import random
+from hashlib import sha256
+from student import Student
+
+FIRST_NAMES = ["Ahmed", "Sara", "Omar", "Mona", "Youssef", "Nour", "Karim", "Laila", "Hassan", "Fatma",
+               "Ali", "Mariam", "Khaled", "Salma", "Tarek", "Hana", "Mostafa", "Yasmin", "Amr", "Dina"]
+LAST_NAMES = ["Ali", "Mohamed", "Hassan", "Ibrahim", "Mahmoud", "Saleh", "Fathy", "Nabil", "Samir", "Adel",
+              "Farouk", "Gamal", "Kamal", "Lotfy", "Mansour", "Osman", "Ragab", "Sabry", "Taha", "Zaki"]
+GRADES = ["A+", "A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D", "F"]
+
+
+def student_name(rng):
+    # Unique enough for realistic index selectivity: a first and last name
+    # plus a numeric suffix drawn from a wide range.
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randrange(1_000_000)}"
+
+
+def generate_students(count, seed = 0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield Student(name = student_name(rng), age = rng.randint(17, 30), grade = rng.choice(GRADES))
+
+
+def populate(database, count, seed = 0, batch_size = 5000):
+    # Bulk-loads `count` synthetic students; returns how many were stored.
+    inserted, failed = database.insert_students(generate_students(count, seed), batch_size = batch_size)
+    return inserted
+
+
+def write_accounts(path, count, password = "password"):
+    # A users.json with `count` accounts that all share one password.
+    hashed = sha256(password.encode()).hexdigest()
+    accounts = {f"user{i}": {"username": f"user{i}", "password": hashed} for i in range(count)}
+    with open(path, 'w') as file:
+        json.dump(accounts, file)
+    return list(accounts)
@@ -0,0 +1,207 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from account_store import AccountStore
+from chatbot import Chatbot
+from database import Database
+from user import User
+from benchmarks.datasets import generate_students, populate, write_accounts
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+
+def parse_size(text):
+    if text in SIZES:
+        return SIZES[text]
+    return int(text)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "ops": len(latencies),
+        "total_s": round(total, 6),
+        "throughput_per_s": round(len(latencies) / total, 1) if total else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4) if latencies else None,
+    }
+
+
+def timed(fn, items):
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def peak_rss_kb():
+    # Peak resident set size of this process so far. ru_maxrss is in KiB on
+    # Linux and in bytes on macOS; unavailable on Windows.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def misspell(name, rng):
+    # Swaps two neighbouring letters of the first word, e.g. "Sara" -> "Sraa".
+    first, _, rest = name.partition(" ")
+    if len(first) > 2:
+        i = rng.randrange(len(first) - 1)
+        first = first[:i] + first[i + 1] + first[i] + first[i + 2:]
+    return f"{first} {rest}"
+
+
+def dataset_files(workdir, size):
+    # Everything bench_size writes for one size, WAL and shm files included.
+    return (glob.glob(os.path.join(glob.escape(workdir), f"students_{size}.db*"))
+            + glob.glob(os.path.join(glob.escape(workdir), f"users_{size}.json")))
+
+
+def remove_dataset(workdir, size):
+    for path in dataset_files(workdir, size):
+        os.remove(path)
+
+
+def bench_size(size, ops, seed, workdir, max_accounts):
+    # Runs in its own process, so peak_rss_kb covers this dataset only.
+    # Files left by an earlier --keep run are replaced, so the ids sampled
+    # below always exist.
+    remove_dataset(workdir, size)
+    results = {}
+    rng = random.Random(seed)
+    db = Database(os.path.join(workdir, f"students_{size}.db"), cache_size = 0)
+
+    start = time.perf_counter()
+    inserted = populate(db, size, seed)
+    elapsed = time.perf_counter() - start
+    results["insert_students"] = {"ops": inserted, "total_s": round(elapsed, 6),
+                                  "throughput_per_s": round(inserted / elapsed, 1) if elapsed else None}
+
+    sample = min(ops, size)
+    ids = [rng.randint(1, size) for _ in range(sample)]
+    names = [s.name for s in db.fetch_students_by_ids(ids)]
+
+    results["insert_student"] = timed(db.insert_student, generate_students(sample, seed + 1))
+    results["fetch_students"] = timed(lambda _: db.fetch_students(), range(3 if size <= SIZES["1M"] else 1))
+    results["fetch_student_by_id"] = timed(lambda i: db.fetch_student(student_id = i), ids)
+    results["fetch_student_by_name"] = timed(lambda n: db.fetch_student(student_name = n), names)
+
+    # cache_size = 0 makes every question reach the database.
+    chatbot = Chatbot(db, cache_size = 0)
+    intents = {
+        "list": ["list students"] * min(sample, 100),
+        "count": ["how many students"] * sample,
+        "help": ["help"] * sample,
+        "find": [f"find student {n}" for n in names],
+    }
+    for intent, queries in intents.items():
+        results[f"chatbot_{intent}"] = timed(chatbot.respond, queries)
+
+    start = time.perf_counter()
+    chatbot.name_index
+    results["chatbot_name_index_build_s"] = round(time.perf_counter() - start, 6)
+    fuzzy = [f"find student {misspell(n, rng)}" for n in names[:min(sample, 200)]]
+    results["chatbot_find_fuzzy"] = timed(chatbot.respond, fuzzy)
+
+    results["delete_student"] = timed(db.delete_student, rng.sample(range(1, size + 1), sample))
+    db.close()
+
+    accounts_path = os.path.join(workdir, f"users_{size}.json")
+    usernames = write_accounts(accounts_path, min(size, max_accounts))
+    user_manager = User(AccountStore(accounts_path))
+    logins = [rng.choice(usernames) for _ in range(sample)]
+    # authenticate_user prints its outcome on every call.
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["authenticate_user_first"] = timed(lambda n: user_manager.authenticate_user(n, "password"),
+                                                   logins[:1])
+        results["authenticate_user"] = timed(lambda n: user_manager.authenticate_user(n, "password"), logins)
+    results["accounts"] = len(usernames)
+
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark Database, Chatbot and login hot paths.")
+    parser.add_argument("--sizes", default = "10k,100k",
+                        help = "comma-separated dataset sizes: 10k, 100k, 1M, 10M or a number")
+    parser.add_argument("--ops", type = int, default = 1000, help = "operations per timed benchmark")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--max-accounts", type = int, default = 1_000_000,
+                        help = "upper bound on the size of the generated users.json")
+    parser.add_argument("--workdir", help = "where to create the databases (default: a temp directory)")
+    parser.add_argument("--keep", action = "store_true", help = "keep the generated files")
+    parser.add_argument("--output", help = "write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # A --workdir may hold other files: only what this run wrote is removed
+    # from it, while a temp directory of our own is removed whole.
+    own_workdir = args.workdir is None
+    workdir = tempfile.mkdtemp(prefix = "student-bench-") if own_workdir else args.workdir
+    os.makedirs(workdir, exist_ok = True)
+    sizes = []
+    report = {
+        "started": datetime.now(timezone.utc).isoformat(timespec = "seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "ops": args.ops,
+        "seed": args.seed,
+        "results": {},
+    }
+
+    try:
+        for label in args.sizes.split(","):
+            label = label.strip()
+            sizes.append(parse_size(label))
+            print(f"Benchmarking {label} students...", file = sys.stderr)
+            with ProcessPoolExecutor(1) as pool:
+                report["results"][label] = pool.submit(bench_size, sizes[-1], args.ops, args.seed,
+                                                       workdir, args.max_accounts).result()
+    finally:
+        if not args.keep:
+            if own_workdir:
+                shutil.rmtree(workdir, ignore_errors = True)
+            else:
+                for size in sizes:
+                    remove_dataset(workdir, size)
+
+    output = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,58 +1,193 @@
-class Chatbot:
-    def __init__(self, database):
-        self.db = database
-
-    def respond(self, query):
-        query = query.strip().lower()
-
-        if "list" in query and "students" in query:
-            return self._list_students()
-
-        elif "count" in query or "how many" in query:
-            return self._count_students()
-
-        elif "help" in query:
-            return self._help()
-
-        elif "find student" in query:
-            name = self._extract_name(query)
-            if name:
-                return self._find_student_by_name(name)
-            else:
-                return "Please specify a student name. For example: 'Find student Ali'."
-
-        else:
-            return "Sorry, I didn't understand that. Type 'help' to see what I can do."
-
-    def _list_students(self):
-        students = self.db.fetch_students()
-        if not students:
-            return "No students found in the database."
-        return "\n".join([f"ID: {s[0]}, Name: {s[1]}, Age: {s[2]}, Grade: {s[3]}" for s in students])
-
-    def _count_students(self):
-        students = self.db.fetch_students()
-        return f"Total number of students: {len(students)}"
-
-    def _find_student_by_name(self, name):
-        matches = self.db.fetch_student(student_name=name)
-        if matches:
-            return "\n".join([f"Found: ID {s[0]}, Name: {s[1]}, Age: {s[2]}, Grade: {s[3]}" for s in matches])
-        else:
-            return f"No student found with the name '{name}'."
-
-    def _extract_name(self, query):
-        # crude way to extract name after "find student"
-        if "find student" in query:
-            parts = query.split("find student")
-            return parts[1].strip().capitalize() if len(parts) > 1 else None
-        return None
-
-    def _help(self):
-        return (
-            "You can ask:\n"
-            "- 'List students'\n"
-            "- 'Count students'\n"
-            "- 'Find student <name>'\n"
-            "- 'Help'"
-        )
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import islice
+from name_index import NameIndex
+
+LIST_LIMIT = 20
+# Longer messages are cut before routing; nothing a user asks needs more.
+MAX_QUERY_CHARS = 500
+
+class Intent:
+    def __init__(self, name, pattern, handler, cached = False):
+        # `pattern` is searched for anywhere in the query, case-insensitively;
+        # a tuple of patterns must all be found. Named groups in them are
+        # passed to `handler` as keyword arguments. Answers of cached intents
+        # are reused until the students table changes.
+        self.name = name
+        self.patterns = [re.compile(p, re.IGNORECASE | re.DOTALL)
+                         for p in ((pattern,) if isinstance(pattern, str) else pattern)]
+        self.handler = handler
+        self.cached = cached
+
+    def match(self, text):
+        # Handler arguments if every pattern is found in text, else None.
+        args = {}
+        for pattern in self.patterns:
+            found = pattern.search(text)
+            if found is None:
+                return None
+            args.update({k: (v or "").strip() for k, v in found.groupdict().items()})
+        return args
+
+class Chatbot:
+    def __init__(self, database, cache_size = 512):
+        self.db = database
+        self.intents = []
+        self.cache_size = cache_size
+        self._answers = OrderedDict()
+        self._answers_version = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._name_index = None
+        self._index_thread = None
+        self._index_lock = threading.Lock()
+
+        # Earlier intents win when several match.
+        self.register_intent("list", (r"list", r"students"), self._list_students, cached=True)
+        self.register_intent("count", r"count|how many", self._count_students, cached=True)
+        self.register_intent("help", r"help", self._help)
+        self.register_intent("find", r"find student(?P<name>.*)", self._find_student, cached=True)
+
+    def register_intent(self, name, pattern, handler, cached = False):
+        if not name.isidentifier():
+            raise ValueError(f"Intent name must be an identifier, got '{name}'")
+        self.intents.append(Intent(name, pattern, handler, cached))
+
+    def respond(self, query):
+        text = query.strip()[:MAX_QUERY_CHARS]
+        for intent in self.intents:
+            args = intent.match(text)
+            if args is not None:
+                break
+        else:
+            return "Sorry, I didn't understand that. Type 'help' to see what I can do."
+
+        if not intent.cached:
+            return intent.handler(**args)
+        return self._cached_answer(intent, args)
+
+    def _cached_answer(self, intent, args):
+        key = (intent.name,) + tuple(sorted((k, v.lower()) for k, v in args.items()))
+        # Answers given before the name index was ready lack its
+        # suggestions, so they are dropped once it is.
+        version = (self.db.data_version(), self._name_index is not None)
+        with self._lock:
+            if version != self._answers_version:
+                self._answers.clear()
+                self._answers_version = version
+
+            if key in self._answers:
+                self._answers.move_to_end(key)
+                return self._answers[key]
+
+            # Concurrent users asking the same question share one query;
+            # different questions are answered in parallel.
+            pending = self._pending.get((version, key))
+            owner = pending is None
+            if owner:
+                pending = self._pending[(version, key)] = Future()
+
+        if not owner:
+            return pending.result()
+
+        try:
+            answer = intent.handler(**args)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[(version, key)]
+        pending.set_result(answer)
+
+        with self._lock:
+            # Not stored if the data changed while it was computed.
+            if version == self._answers_version:
+                self._answers[key] = answer
+                while len(self._answers) > self.cache_size:
+                    self._answers.popitem(last=False)
+        return answer
+
+    def _list_students(self):
+        # Only the first LIST_LIMIT rows are read; the rest is summarised.
+        students = self.db.iter_students(batch_size=LIST_LIMIT)
+        lines = [f"ID: {s.id}, Name: {s.name}, Age: {s.age}, Grade: {s.grade}"
+                 for s in islice(students, LIST_LIMIT)]
+        students.close()
+        if not lines:
+            return "No students found in the database."
+
+        remaining = self.db.stats()["count"] - len(lines)
+        if remaining > 0:
+            lines.append(f"... and {remaining} more. Try 'find student <name>' to narrow it down.")
+        return "\n".join(lines)
+
+    def _count_students(self):
+        return f"Total number of students: {self.db.stats()['count']}"
+
+    def _find_student(self, name):
+        if not name:
+            return "Please specify a student name. For example: 'Find student Ali'."
+        return self._find_student_by_name(name)
+
+    def start_name_index(self):
+        # Builds the name index on a background thread; a full-table
+        # build takes seconds on large tables. Started by the first lookup
+        # with no exact or full-text match, so processes that never need
+        # suggestions never hold the index. Until it is ready, lookups
+        # answer from exact and full-text matches only.
+        with self._index_lock:
+            if self._name_index is None and self._index_thread is None:
+                self._index_thread = threading.Thread(target=self._build_name_index, name="name-index",
+                                                      daemon=True)
+                self._index_thread.start()
+            return self._index_thread
+
+    def _build_name_index(self):
+        try:
+            self._name_index = NameIndex(self.db)
+        finally:
+            # A failed build is retried by the next start_name_index().
+            with self._index_lock:
+                self._index_thread = None
+
+    @property
+    def name_index(self):
+        # Waits for the index to be built. Once built it is kept current by
+        # Database change events and, before each lookup, by the change log.
+        thread = self.start_name_index()
+        if thread is not None:
+            thread.join()
+        return self._name_index
+
+    def _find_student_by_name(self, name):
+        matches = self.db.fetch_student(student_name=name)
+        if not matches:
+            matches = self.db.search_students(name, limit=10)
+        if matches:
+            return "\n".join([f"Found: ID {s.id}, Name: {s.name}, Age: {s.age}, Grade: {s.grade}" for s in matches])
+
+        index = self._name_index
+        if index is None:
+            self.start_name_index()
+            return f"No student found with the name '{name}'."
+        index.refresh()
+        similar = index.search(name, limit=5)
+        if similar:
+            students = {s.id: s for s in self.db.fetch_students_by_ids([r[0] for r in similar])}
+            lines = [f"No exact match for '{name}'. Did you mean:"]
+            lines += [f"- ID {s.id}, Name: {s.name}, Age: {s.age}, Grade: {s.grade}"
+                      for s in (students.get(r[0]) for r in similar) if s]
+            return "\n".join(lines)
+        return f"No student found with the name '{name}'."
+
+    def _help(self):
+        return (
+            "You can ask:\n"
+            "- 'List students'\n"
+            "- 'Count students'\n"
+            "- 'Find student <name>'\n"
+            "- 'Help'"
+        )
@@ -0,0 +1,180 @@
+import argparse
+import sys
+
+# Headless entry point for cron jobs and scripts:
+#   python -m cli import students.csv
+#   python -m cli export students.csv.gz --format csv.gz --grade A
+#   python -m cli stats --json
+#   python -m cli search "ahmed al"
+#   python -m cli delete --id 12 --id 15
+#   python -m cli add-user alice
+#   python -m cli prune-changes --days 7
+# Streamlit is never imported, and pandas only by "import --validate".
+# Modules are imported inside the commands so each pays only for its own.
+
+
+def open_database(args):
+    from database import Database
+    # A one-shot process gains nothing from the read cache.
+    return Database(args.db, cache_size = 0)
+
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--name", help = "name prefix, case-insensitive")
+    parser.add_argument("--grade")
+    parser.add_argument("--min-age", type = int)
+    parser.add_argument("--max-age", type = int)
+
+
+
+def filters_from(args):
+    filters = {"name": args.name, "grade": args.grade, "min_age": args.min_age, "max_age": args.max_age}
+    return {key: value for key, value in filters.items() if value is not None}
+
+
+
+def format_student(student):
+    return f"ID: {student.id}, Name: {student.name}, Age: {student.age}, Grade: {student.grade}"
+
+
+
+def cmd_import(args):
+    from importer import import_csv
+    return import_csv(open_database(args), args)
+
+
+
+def cmd_export(args):
+    written = open_database(args).export(args.destination, format = args.format, filters = filters_from(args),
+                                         chunk_size = args.chunk_size)
+    print(f"Exported {written} students to {args.destination}")
+    return 0
+
+
+
+def cmd_stats(args):
+    stats = open_database(args).stats()
+    if args.json:
+        import json
+        print(json.dumps(stats))
+    else:
+        average = f"{stats['average_age']:.1f}" if stats["average_age"] is not None else "-"
+        print(f"Students: {stats['count']}")
+        print(f"Average age: {average}")
+        print(f"Youngest: {stats['min_age'] if stats['min_age'] is not None else '-'}")
+        print(f"Grades: {stats['unique_grades']}")
+    return 0
+
+
+
+def cmd_search(args):
+    students = open_database(args).search_students(args.query, limit = args.limit)
+    for student in students:
+        print(format_student(student))
+    if not students:
+        print(f"No student found matching '{args.query}'.", file = sys.stderr)
+        return 1
+    return 0
+
+
+
+def cmd_delete(args):
+    filters = filters_from(args)
+    if filters and args.ids is None and not args.yes:
+        print("Deleting by filter removes every matching student; add --yes to confirm.", file = sys.stderr)
+        return 2
+    try:
+        deleted = open_database(args).delete_students(ids = args.ids, filters = filters)
+    except ValueError as e:
+        print(e, file = sys.stderr)
+        return 2
+    print(f"Deleted {deleted} students")
+    return 0
+
+
+
+def cmd_add_user(args):
+    if args.admin:
+        from credentials import Credentials
+        manager, store = Credentials(), Credentials.store_credentials
+    else:
+        from user import User
+        manager, store = User(), User.store_users
+
+    # Read from stdin when piped, so scripts need not put it in argv.
+    import getpass
+    password = getpass.getpass() if sys.stdin.isatty() else sys.stdin.readline().rstrip("\n")
+    if not password:
+        print("Password must not be empty.", file = sys.stderr)
+        return 2
+    return 0 if store(manager, args.username, password) else 1
+
+
+
+def cmd_prune_changes(args):
+    try:
+        removed = open_database(args).prune_changes(before_seq = args.before_seq, keep_days = args.days,
+                                                    keep_rows = args.rows)
+    except ValueError as e:
+        print(e, file = sys.stderr)
+        return 2
+    print(f"Removed {removed} change log entries")
+    return 0
+
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog = "python -m cli", description = "Manage the student database.")
+    parser.add_argument("--db", default = "students.db")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    command = commands.add_parser("import", help = "import students from a CSV file")
+    # Imported only to declare its options; importer loads nothing heavy.
+    from importer import add_arguments
+    add_arguments(command)
+    command.set_defaults(run = cmd_import)
+
+    command = commands.add_parser("export", help = "export students to csv, csv.gz or parquet")
+    command.add_argument("destination")
+    command.add_argument("--format", default = "csv", choices = ("csv", "csv.gz", "parquet"))
+    command.add_argument("--chunk-size", type = int, default = 5000)
+    add_filter_arguments(command)
+    command.set_defaults(run = cmd_export)
+
+    command = commands.add_parser("stats", help = "print the dashboard metrics")
+    command.add_argument("--json", action = "store_true")
+    command.set_defaults(run = cmd_stats)
+
+    command = commands.add_parser("search", help = "find students by name words")
+    command.add_argument("query")
+    command.add_argument("--limit", type = int, default = 20)
+    command.set_defaults(run = cmd_search)
+
+    command = commands.add_parser("delete", help = "delete students by id or filter")
+    command.add_argument("--id", dest = "ids", type = int, action = "append")
+    add_filter_arguments(command)
+    command.add_argument("--yes", action = "store_true", help = "confirm a delete by filter")
+    command.set_defaults(run = cmd_delete)
+
+    command = commands.add_parser("add-user", help = "register an account (password from the prompt or stdin)")
+    command.add_argument("username")
+    command.add_argument("--admin", action = "store_true", help = "add an admin instead of a user")
+    command.set_defaults(run = cmd_add_user)
+
+    command = commands.add_parser("prune-changes", help = "trim the change log (run from cron)")
+    command.add_argument("--days", type = float, help = "drop entries older than this many days")
+    command.add_argument("--rows", type = int, help = "keep at most this many entries")
+    command.add_argument("--before-seq", type = int, help = "drop entries before this seq")
+    command.set_defaults(run = cmd_prune_changes)
+    return parser
+
+
+
+def main(argv = None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# How often a cancellable caller waiting for a connection or the write
+# lock checks whether it has been cancelled.
+CANCEL_POLL_S = 0.05
+
+
+class ConnectionPool:
+    # One writer connection behind a lock, plus a bounded pool of reader
+    # connections. In WAL mode readers never block the writer or each other.
+    def __init__(self, db_name, max_readers = 8, busy_timeout_ms = 5000, cache_size_kb = 20000, stats = None):
+        self.db_name = db_name
+        # Optional QueryStats; every statement on every connection reports to it.
+        self.stats = stats
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.max_readers = max_readers
+
+        # An in-memory database exists only inside one connection, so every
+        # caller has to share the writer.
+        self.shared = db_name == ":memory:" or db_name.startswith("file::memory:")
+
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._write_thread = None
+        self._after_commit = []
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        # thread id -> connections that thread is using right now, so a
+        # running query can be interrupted from another thread.
+        self._active = {}
+        # Per thread: the cancel token set by cancellable(), if any.
+        self._local = threading.local()
+
+        self.writer = self._connect()
+        if not self.shared:
+            self.writer.execute("PRAGMA journal_mode = WAL")
+
+
+
+    def _connect(self):
+        factory = sqlite3.Connection
+        if self.stats is not None:
+            # Imported here so uninstrumented callers (the CLI) skip it.
+            from instrumentation import InstrumentedConnection
+            factory = InstrumentedConnection
+        conn = sqlite3.connect(self.db_name, timeout = self.busy_timeout_ms / 1000,
+                               check_same_thread = False, factory = factory)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        # NORMAL is durable across application crashes in WAL mode and only
+        # fsyncs at checkpoints instead of on every commit.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if self.stats is not None:
+            conn.stats = self.stats
+        return conn
+
+
+
+    @contextmanager
+    def write(self):
+        # Commits when the block finishes, rolls back if it raises. A block
+        # nested inside another on the same thread is a savepoint instead:
+        # it can fail and roll back alone, and nothing is committed until
+        # the outermost block finishes.
+        self._lock_writer()
+        try:
+            with self._using(self.writer):
+                if self._write_depth:
+                    with self._savepoint():
+                        yield self.writer
+                    return
+
+                self._write_depth = 1
+                self._write_thread = threading.get_ident()
+                try:
+                    yield self.writer
+                    self.writer.commit()
+                except BaseException:
+                    self.writer.rollback()
+                    self._after_commit.clear()
+                    raise
+                finally:
+                    self._write_depth = 0
+                    self._write_thread = None
+                callbacks, self._after_commit = self._after_commit, []
+        finally:
+            self._write_lock.release()
+
+        for callback in callbacks:
+            callback()
+
+
+
+    @contextmanager
+    def _savepoint(self):
+        name = f"nested_write_{self._write_depth}"
+        self._write_depth += 1
+        pending = len(self._after_commit)
+        # Releasing a savepoint opened outside a transaction would commit;
+        # keep the outer block's transaction open instead.
+        if not self.writer.in_transaction:
+            self.writer.execute("BEGIN")
+        self.writer.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+            self.writer.execute(f"RELEASE {name}")
+        except BaseException:
+            self.writer.execute(f"ROLLBACK TO {name}")
+            self.writer.execute(f"RELEASE {name}")
+            del self._after_commit[pending:]
+            raise
+        finally:
+            self._write_depth -= 1
+
+
+
+    def after_commit(self, callback):
+        # Runs callback once the current thread's outermost write() has
+        # committed, or right away when the thread is not inside one.
+        if self._write_depth and self._write_thread == threading.get_ident():
+            self._after_commit.append(callback)
+        else:
+            callback()
+
+
+
+    @contextmanager
+    def read(self):
+        if self.shared:
+            self._lock_writer()
+            try:
+                with self._using(self.writer):
+                    yield self.writer
+            finally:
+                self._write_lock.release()
+            return
+
+        conn = self._acquire()
+        try:
+            with self._using(conn):
+                yield conn
+        finally:
+            self._release(conn)
+
+
+
+    @contextmanager
+    def _using(self, conn):
+        thread_id = threading.get_ident()
+        in_use = self._active.setdefault(thread_id, [])
+        in_use.append(conn)
+        try:
+            yield
+        finally:
+            in_use.remove(conn)
+            if not in_use:
+                self._active.pop(thread_id, None)
+
+
+
+    @contextmanager
+    def cancellable(self, token):
+        # Inside the block, this thread's reads and writes give up with
+        # sqlite3.OperationalError("interrupted") once `token` (a
+        # threading.Event) is set: while waiting for a connection or the
+        # write lock, and right after getting one. interrupt() covers the
+        # statement already running.
+        self._local.cancel = token
+        try:
+            yield
+        finally:
+            self._local.cancel = None
+
+
+
+    def _check_cancelled(self):
+        token = getattr(self._local, "cancel", None)
+        if token is not None and token.is_set():
+            raise sqlite3.OperationalError("interrupted")
+
+
+
+    def _lock_writer(self):
+        if getattr(self._local, "cancel", None) is None:
+            self._write_lock.acquire()
+            return
+        while not self._write_lock.acquire(timeout = CANCEL_POLL_S):
+            self._check_cancelled()
+        try:
+            self._check_cancelled()
+        except BaseException:
+            self._write_lock.release()
+            raise
+
+
+
+    def interrupt(self, thread_id):
+        # Aborts whatever statement the given thread is running; it fails
+        # with sqlite3.OperationalError("interrupted").
+        for conn in list(self._active.get(thread_id, ())):
+            conn.interrupt()
+
+
+
+    def _acquire(self):
+        self._check_cancelled()
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                return self._connect()
+
+        if getattr(self._local, "cancel", None) is None:
+            return self._readers.get()
+        while True:
+            try:
+                conn = self._readers.get(timeout = CANCEL_POLL_S)
+            except queue.Empty:
+                self._check_cancelled()
+                continue
+            try:
+                self._check_cancelled()
+            except BaseException:
+                self._readers.put(conn)
+                raise
+            return conn
+
+
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+
+
+    def close(self):
+        with self._write_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self.writer.close()
@@ -1,57 +1,49 @@
-import json
-from hashlib import sha256
-
-class Credentials:
-    def __init__(self):
-        pass
-
-
-
-
-    def load_credentials(self):
-        try:
-            with open("credentials.json", 'r') as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return {}
-        except json.JSONDecodeError:
-            return {}
-        
-
-
-           
-    def store_credentials(self, name, password):
-        credentials = self.load_credentials()
-
-        if name in credentials:
-            print(f"Username '{name}' already exists. Please choose a different one.")
-            return False  
-
-        hashed_pwd = hashed_password = sha256(password.encode()).hexdigest() 
-
-        credentials[name] = {"username" : name,
-                             "password" : hashed_pwd}
-        with open("credentials.json", 'w') as file:
-            json.dump(credentials, file, indent = 4)
-
-
-
-            
-
-    def authenticate_credentials(self, name, password):
-        users = self.load_credentials()
-
-        if name not in users:
-            print("Username not found.")
-            return False
-
-        hashed_input = sha256(password.encode()).hexdigest()
-        stored_hash = users[name]["password"]
-
-        if hashed_input == stored_hash:
-            print("Authentication successful.")
-            return True
-        else:
-            print("Incorrect password.")
-            return False
+from hashlib import sha256
+from account_store import AccountStore
+
+class Credentials:
+    def __init__(self, store = None):
+        # Any object with get/all/add works here, e.g. a SqliteAccountStore.
+        self.store = store or AccountStore.for_path("credentials.json")
+
+
+
+
+    def load_credentials(self):
+        return self.store.all()
+        
+
+
+
+    
+    def store_credentials(self, name, password):
+        hashed_pwd = sha256(password.encode()).hexdigest()
+
+        if not self.store.add(name, {"username" : name,
+                                     "password" : hashed_pwd}):
+            print(f"Username '{name}' already exists. Please choose a different one.")
+            return False
+
+        return True
+
+
+
+
+        
+    def authenticate_credentials(self, name, password):
+        account = self.store.get(name)
+
+        if account is None:
+            print("Username not found.")
+            return False
+
+        hashed_input = sha256(password.encode()).hexdigest()
+        stored_hash = account["password"]
+
+        if hashed_input == stored_hash:
+            print("Authentication successful.")
+            return True
+        else:
+            print("Incorrect password.")
+            return False
         
\ No newline at end of file
@@ -1,73 +1,962 @@
-import sqlite3
-from student import Student
-
-class Database:
-    def __init__(self, db_name = "students.db"):
-        self.conn = sqlite3.connect(db_name, check_same_thread = False)
-        self.cursor = self.conn.cursor()
-        self.cursor.execute(""" 
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='students';
-        """)
-        table_exists = self.cursor.fetchone()
-
-        if not table_exists:
-            self._create_students_table()
-
-
-
-    def _create_students_table(self):
-        self.cursor.execute("""
-            CREATE TABLE students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                age INTEGER,
-                grade TEXT
-            )
-        """)
-
-        self.conn.commit()
-
-
-
-
-    def insert_student(self, student):
-        self.cursor.execute("INSERT INTO students (name, age, grade) VALUES (?, ?, ?)",
-            (student.name, student.age, student.grade))
-        self.conn.commit()
-
-
-
-
-    def fetch_students(self):
-        self.cursor.execute("SELECT * FROM students")
-        return self.cursor.fetchall()
-    
-
-
-    
-    def fetch_student(self, student_id = None, student_name = None):
-        if student_id and student_name:
-            self.cursor.execute("SELECT * FROM students WHERE id=? AND name=?", (student_id, student_name))
-        elif student_id:
-            self.cursor.execute("SELECT * FROM students WHERE id=?", (student_id,))
-        elif student_name:
-            self.cursor.execute("SELECT * FROM students WHERE name=?", (student_name,))
-        else:
-            return []  
-
-        return self.cursor.fetchall()
-    
-
-
-    
-    def delete_student(self, student_id):
-        self.cursor.execute("DELETE FROM students WHERE id=?", (student_id,))
-        self.conn.commit()
-
-
-
-
-
-
+import csv
+import io
+import os
+import re
+import sqlite3
+import zlib
+from connection_pool import ConnectionPool
+from query_cache import QueryCache
+from student import Student, StudentColumns
+
+SORTABLE_COLUMNS = ("id", "name", "age", "grade")
+UPDATABLE_COLUMNS = ("name", "age", "grade")
+EXPORT_COLUMNS = ["ID", "Name", "Age", "Grade"]
+EXPORT_FORMATS = ("csv", "csv.gz", "parquet")
+# Errors caused by the values of one row (constraints, unbindable values);
+# insert_students reports these per row instead of failing the batch.
+ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError, ValueError, TypeError)
+
+# Running totals kept in sync with `students` by triggers, so stats()
+# reads a handful of rows instead of scanning the table.
+SUMMARY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS student_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS student_age_counts (
+        age INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS student_grade_counts (
+        grade TEXT PRIMARY KEY,
+        total INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS students_summary_insert AFTER INSERT ON students BEGIN
+        UPDATE student_stats SET total = total + 1 WHERE id = 1;
+        INSERT INTO student_age_counts (age, total) SELECT NEW.age, 1 WHERE NEW.age IS NOT NULL
+            ON CONFLICT (age) DO UPDATE SET total = total + 1;
+        INSERT INTO student_grade_counts (grade, total) SELECT NEW.grade, 1 WHERE NEW.grade IS NOT NULL
+            ON CONFLICT (grade) DO UPDATE SET total = total + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS students_summary_delete AFTER DELETE ON students BEGIN
+        UPDATE student_stats SET total = total - 1 WHERE id = 1;
+        UPDATE student_age_counts SET total = total - 1 WHERE age = OLD.age;
+        DELETE FROM student_age_counts WHERE age = OLD.age AND total <= 0;
+        UPDATE student_grade_counts SET total = total - 1 WHERE grade = OLD.grade;
+        DELETE FROM student_grade_counts WHERE grade = OLD.grade AND total <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS students_summary_update AFTER UPDATE OF age, grade ON students BEGIN
+        UPDATE student_age_counts SET total = total - 1 WHERE age = OLD.age;
+        DELETE FROM student_age_counts WHERE age = OLD.age AND total <= 0;
+        INSERT INTO student_age_counts (age, total) SELECT NEW.age, 1 WHERE NEW.age IS NOT NULL
+            ON CONFLICT (age) DO UPDATE SET total = total + 1;
+        UPDATE student_grade_counts SET total = total - 1 WHERE grade = OLD.grade;
+        DELETE FROM student_grade_counts WHERE grade = OLD.grade AND total <= 0;
+        INSERT INTO student_grade_counts (grade, total) SELECT NEW.grade, 1 WHERE NEW.grade IS NOT NULL
+            ON CONFLICT (grade) DO UPDATE SET total = total + 1;
+    END;
+"""
+
+# Schema migrations, applied in order. PRAGMA user_version records how
+# many have run against a given file.
+MIGRATIONS = [
+    # 1: case-insensitive name lookups and prefix LIKE use an index
+    """
+    CREATE INDEX IF NOT EXISTS idx_students_name ON students (name COLLATE NOCASE);
+    """,
+
+    # 2: full-text index over names, kept in sync by triggers
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        name, content='students', content_rowid='id', tokenize='unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF name ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        INSERT INTO students_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    INSERT INTO students_fts (students_fts) VALUES ('rebuild');
+    """,
+
+    # 3: duplicate detection on upload looks students up by all three fields
+    """
+    CREATE INDEX IF NOT EXISTS idx_students_identity
+        ON students (name COLLATE NOCASE, age, grade COLLATE NOCASE);
+    """,
+
+    # 4: append-only change log read by changes_since(); AUTOINCREMENT
+    # keeps seq increasing even after old entries are pruned
+    """
+    CREATE TABLE IF NOT EXISTS student_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        event TEXT NOT NULL,
+        student_id INTEGER NOT NULL,
+        name TEXT,
+        age INTEGER,
+        grade TEXT,
+        changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TRIGGER IF NOT EXISTS students_changes_insert AFTER INSERT ON students BEGIN
+        INSERT INTO student_changes (event, student_id, name, age, grade)
+            VALUES ('insert', NEW.id, NEW.name, NEW.age, NEW.grade);
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_changes_update AFTER UPDATE OF name, age, grade ON students BEGIN
+        INSERT INTO student_changes (event, student_id, name, age, grade)
+            VALUES ('update', NEW.id, NEW.name, NEW.age, NEW.grade);
+    END;
+    CREATE TRIGGER IF NOT EXISTS students_changes_delete AFTER DELETE ON students BEGIN
+        INSERT INTO student_changes (event, student_id, name, age, grade)
+            VALUES ('delete', OLD.id, OLD.name, OLD.age, OLD.grade);
+    END;
+    """,
+
+    # 5: keyset pages sorted by age or grade walk an index instead of
+    # sorting the table
+    """
+    CREATE INDEX IF NOT EXISTS idx_students_age ON students (age, id);
+    CREATE INDEX IF NOT EXISTS idx_students_grade ON students (grade, id);
+    """,
+]
+
+FTS_MIGRATION = 2
+
+# Public methods timed when the Database is given a QueryStats.
+INSTRUMENTED_METHODS = ("insert_student", "insert_students", "fetch_students_by_ids", "match_existing",
+                        "fetch_students", "fetch_students_page", "count_students", "stats", "fetch_student",
+                        "search_students", "suggest_students", "update_student", "update_students",
+                        "delete_student", "delete_students", "iter_students", "fetch_columns", "iter_export",
+                        "export", "changes_since", "prune_changes")
+
+def _filters_key(filters):
+    return tuple(sorted((filters or {}).items()))
+
+
+
+def encode_csv(row_chunks, format = "csv", written = None):
+    # Yields CSV bytes, gzip-compressed for csv.gz, for lists of
+    # (id, name, age, grade) rows; one output chunk per list. If `written`
+    # is a list, its first item counts the rows encoded.
+    if format not in ("csv", "csv.gz"):
+        raise ValueError(f"iter_export supports csv and csv.gz, not '{format}'")
+
+    # wbits=31 makes zlib write a gzip header and trailer.
+    compressor = zlib.compressobj(wbits = 31) if format == "csv.gz" else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        if written is not None:
+            written[0] += len(rows)
+        chunk = flush()
+        if chunk:
+            yield chunk
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+
+def write_export(destination, row_chunks, format = "csv"):
+    # Writes lists of (id, name, age, grade) rows to a path or binary file
+    # object in one of EXPORT_FORMATS; returns the number of rows written.
+    # Shared by Database.export and RemoteDatabase.export.
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{format}', use one of {', '.join(EXPORT_FORMATS)}")
+
+    if format == "parquet":
+        return _write_parquet(destination, row_chunks)
+
+    written = [0]
+    owned = isinstance(destination, (str, os.PathLike))
+    file = open(destination, 'wb') if owned else destination
+    try:
+        for chunk in encode_csv(row_chunks, format, written):
+            file.write(chunk)
+    finally:
+        if owned:
+            file.close()
+    return written[0]
+
+
+
+def _write_parquet(destination, row_chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+
+    schema = pa.schema([("ID", pa.int64()), ("Name", pa.string()),
+                        ("Age", pa.int64()), ("Grade", pa.string())])
+
+    written = 0
+    with pq.ParquetWriter(destination, schema) as writer:
+        for rows in row_chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type = field.type) for column, field in zip(columns, schema)],
+                schema = schema))
+            written += len(rows)
+    return written
+
+
+class Database:
+    def __init__(self, db_name = "students.db", use_summary = True, max_readers = 8, cache_size = 256,
+                 query_stats = None):
+        self.pool = ConnectionPool(db_name, max_readers = max_readers, stats = query_stats)
+        # Read results are cached until a write invalidates them. Writes
+        # from other processes are noticed through the change log's seq.
+        self.cache = QueryCache(max_entries = cache_size)
+        self._listeners = []
+        self._seen_seq = None
+
+        with self.pool.read() as conn:
+            table_exists = conn.execute(""" 
+                SELECT name FROM sqlite_master 
+                WHERE type='table' AND name='students';
+            """).fetchone()
+
+        if not table_exists:
+            self._create_students_table()
+
+        self._migrate()
+
+        self.use_summary = use_summary
+        if use_summary:
+            self._create_summary_tables()
+
+        self.query_stats = query_stats
+        if query_stats is not None:
+            query_stats.db_name = db_name
+            query_stats.instrument(self, INSTRUMENTED_METHODS)
+
+
+
+    def _create_students_table(self):
+        with self.pool.write() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS students (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    age INTEGER,
+                    grade TEXT
+                )
+            """)
+
+
+
+    def _migrate(self):
+        with self.pool.write() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            fts_available = self._fts_available(conn)
+
+            for number, script in enumerate(MIGRATIONS[version:], start = version + 1):
+                if number == FTS_MIGRATION and not fts_available:
+                    # This SQLite build has no FTS5; search_students falls back
+                    # to prefix matching on the name index.
+                    script = ""
+                conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+
+            self.has_fts = conn.execute("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='students_fts';
+            """).fetchone() is not None
+
+
+
+    def _fts_available(self, conn):
+        try:
+            conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            conn.execute("DROP TABLE temp.fts5_probe")
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+
+
+    def _create_summary_tables(self):
+        with self.pool.write() as conn:
+            if conn.execute("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='student_stats';
+            """).fetchone():
+                return
+
+            # First run against this file: build the summary from the existing
+            # rows in the same transaction that installs the triggers.
+            conn.executescript("BEGIN;" + SUMMARY_SCHEMA + """
+                INSERT INTO student_stats (id, total) SELECT 1, COUNT(*) FROM students;
+                INSERT INTO student_age_counts (age, total)
+                    SELECT age, COUNT(*) FROM students WHERE age IS NOT NULL GROUP BY age;
+                INSERT INTO student_grade_counts (grade, total)
+                    SELECT grade, COUNT(*) FROM students WHERE grade IS NOT NULL GROUP BY grade;
+                COMMIT;
+            """)
+
+
+
+
+    def insert_student(self, student):
+        with self.pool.write() as conn:
+            student_id = conn.execute("INSERT INTO students (name, age, grade) VALUES (?, ?, ?)",
+                (student.name, student.age, student.grade)).lastrowid
+        self._changed("insert", [student_id])
+        return student_id
+
+
+
+
+    def insert_students(self, students, batch_size = 500, progress = None):
+        # Inserts in chunks of batch_size, one transaction per chunk.
+        # Returns (inserted_count, failed) where failed is a list of
+        # (index, student, error) for every row that could not be stored.
+        inserted = 0
+        failed = []
+        batch = []
+
+        for index, student in enumerate(students):
+            batch.append((index, student))
+            if len(batch) >= batch_size:
+                ids = self._insert_batch(batch, failed)
+                inserted += len(ids)
+                self._changed("insert", ids)
+                batch = []
+                if progress:
+                    progress(inserted + len(failed))
+
+        if batch:
+            ids = self._insert_batch(batch, failed)
+            inserted += len(ids)
+            self._changed("insert", ids)
+            if progress:
+                progress(inserted + len(failed))
+
+        return inserted, failed
+
+
+
+    def _insert_batch(self, batch, failed):
+        # Returns the ids of the inserted rows.
+        sql = "INSERT INTO students (name, age, grade) VALUES (?, ?, ?)"
+        rows = [(s.name, s.age, s.grade) for _, s in batch]
+        try:
+            with self.pool.write() as conn:
+                conn.executemany(sql, rows)
+                # AUTOINCREMENT hands out consecutive ids while this
+                # transaction holds the write lock.
+                last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'students'").fetchone()[0]
+            return list(range(last_id - len(rows) + 1, last_id + 1))
+        except ROW_ERRORS:
+            pass
+
+        # Something in the chunk is bad: retry row by row so only the
+        # offending rows are dropped, still inside a single transaction.
+        # Any other error (a locked or failing database, an interrupt) is
+        # not the rows' fault and is raised.
+        ids = []
+        with self.pool.write() as conn:
+            for (index, student), row in zip(batch, rows):
+                try:
+                    ids.append(conn.execute(sql, row).lastrowid)
+                except ROW_ERRORS as e:
+                    failed.append((index, student, str(e)))
+        return ids
+
+
+
+
+    def _fetch_all(self, sql, params = ()):
+        # Rows come back as Student records built by the cursor itself.
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Student.from_row
+            return cursor.execute(sql, params).fetchall()
+
+
+
+    def fetch_students_by_ids(self, ids, chunk_size = 500):
+        # Not cached: used by change listeners to read back just the rows
+        # they were told about.
+        ids = list(ids)
+        students = []
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            students.extend(self._fetch_all(
+                f"SELECT * FROM students WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+        return students
+
+
+
+    def match_existing(self, keys):
+        # `keys` is an iterable of (name, age, grade). Returns the positions
+        # of keys a stored student already has, comparing name and grade
+        # case-insensitively. The keys go into a temp table that is joined
+        # against idx_students_identity in a single query.
+        with self.pool.read() as conn:
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS upload_keys (
+                    position INTEGER PRIMARY KEY,
+                    name TEXT,
+                    age INTEGER,
+                    grade TEXT
+                )
+            """)
+            try:
+                conn.executemany("INSERT INTO upload_keys (position, name, age, grade) VALUES (?, ?, ?, ?)",
+                                 ((position,) + tuple(key) for position, key in enumerate(keys)))
+                return [row[0] for row in conn.execute("""
+                    SELECT position FROM upload_keys
+                    WHERE EXISTS (
+                        SELECT 1 FROM students
+                        WHERE students.name = upload_keys.name COLLATE NOCASE
+                          AND students.age = upload_keys.age
+                          AND students.grade = upload_keys.grade COLLATE NOCASE
+                    )
+                    ORDER BY position
+                """)]
+            finally:
+                conn.execute("DELETE FROM upload_keys")
+                conn.commit()
+
+
+
+    def fetch_students(self):
+        return list(self._cached(("students",), lambda: self._fetch_all("SELECT * FROM students")))
+    
+
+
+    
+    def fetch_students_page(self, after = None, limit = 50, order_by = "id", descending = False,
+                            filters = None, offset = None):
+        # Keyset pagination: pass the next_cursor returned by the previous
+        # call as `after` so deep pages cost the same as the first one.
+        # For order_by="id" the cursor is the last id, otherwise it is a
+        # (value, id) pair. `offset` is only used when no cursor is given.
+        if isinstance(after, list):
+            after = tuple(after)
+        key = ("page", after, limit, order_by, descending, _filters_key(filters), offset)
+        rows, next_cursor = self._cached(key, lambda: self._fetch_students_page(
+            after, limit, order_by, descending, filters, offset))
+        return list(rows), next_cursor
+
+
+
+    def _fetch_students_page(self, after, limit, order_by, descending, filters, offset):
+        if order_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by '{order_by}'")
+
+        where, params = self._build_filters(filters)
+        op = "<" if descending else ">"
+        direction = "DESC" if descending else "ASC"
+        # Names sort case-insensitively so idx_students_name serves the
+        # ORDER BY; age and grade have (column, id) indexes.
+        column = "name COLLATE NOCASE" if order_by == "name" else order_by
+
+        # Each segment is extra WHERE terms for one index range, read in
+        # order until the page is full. SQLite sorts NULLs first, so they
+        # are a range of their own before (ascending) or after (descending)
+        # the other values, which a row-value comparison never matches.
+        segments = [([], [])]
+        if after is not None and order_by == "id":
+            segments = [([f"id {op} ?"], [after])]
+        elif after is not None:
+            value, last_id = after
+            if value is None:
+                segments = [([f"{order_by} IS NULL", f"id {op} ?"], [last_id])]
+                if not descending:
+                    segments.append(([f"{order_by} IS NOT NULL"], []))
+            else:
+                # The row value (column, id) > (?, ?) spelled out, which
+                # SQLite can turn into an index range even with COLLATE.
+                segments = [([f"{column} {op}= ?", f"({column} {op} ? OR id {op} ?)"],
+                             [value, value, last_id])]
+                if descending:
+                    segments.append(([f"{order_by} IS NULL"], []))
+
+        if order_by == "id":
+            order = f"id {direction}"
+        else:
+            order = f"{column} {direction}, id {direction}"
+
+        rows = []
+        for extra_where, extra_params in segments:
+            wanted = limit + 1 - len(rows)
+            if wanted <= 0:
+                break
+            sql = "SELECT * FROM students"
+            if where or extra_where:
+                sql += " WHERE " + " AND ".join(where + extra_where)
+            sql += f" ORDER BY {order} LIMIT ?"
+            segment_params = params + extra_params + [wanted]
+            if after is None and offset:
+                sql += " OFFSET ?"
+                segment_params.append(offset)
+            rows += self._fetch_all(sql, segment_params)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = last.id if order_by == "id" else (getattr(last, order_by), last.id)
+        return rows, next_cursor
+
+
+
+    def count_students(self, filters = None):
+        return self._cached(("count", _filters_key(filters)), lambda: self._count_students(filters))
+
+
+
+    def _count_students(self, filters):
+        where, params = self._build_filters(filters)
+        sql = "SELECT COUNT(*) FROM students"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.pool.read() as conn:
+            return conn.execute(sql, params).fetchone()[0]
+
+
+
+    def stats(self):
+        # Dashboard metrics: count, average age, youngest age and the number
+        # of distinct grades.
+        return dict(self._cached(("stats",), self._stats))
+
+
+
+    def _stats(self):
+        if self.use_summary:
+            sql = """
+                SELECT (SELECT total FROM student_stats WHERE id = 1),
+                       (SELECT SUM(age * total) * 1.0 / SUM(total) FROM student_age_counts),
+                       (SELECT MIN(age) FROM student_age_counts),
+                       (SELECT COUNT(*) FROM student_grade_counts)
+            """
+        else:
+            sql = "SELECT COUNT(*), AVG(age), MIN(age), COUNT(DISTINCT grade) FROM students"
+
+        with self.pool.read() as conn:
+            count, average_age, min_age, unique_grades = conn.execute(sql).fetchone()
+        return {"count": count or 0,
+                "average_age": average_age,
+                "min_age": min_age,
+                "unique_grades": unique_grades or 0}
+
+
+
+    def _build_filters(self, filters):
+        # Supported filters: name (case-insensitive prefix), grade (exact),
+        # min_age and max_age (inclusive).
+        where = []
+        params = []
+        if not filters:
+            return where, params
+
+        if filters.get("name"):
+            escaped = filters["name"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append(escaped + "%")
+        if filters.get("grade"):
+            where.append("grade = ?")
+            params.append(filters["grade"])
+        if filters.get("min_age") is not None:
+            where.append("age >= ?")
+            params.append(filters["min_age"])
+        if filters.get("max_age") is not None:
+            where.append("age <= ?")
+            params.append(filters["max_age"])
+        return where, params
+
+
+
+    def fetch_student(self, student_id = None, student_name = None):
+        # Names match case-insensitively through idx_students_name.
+        if student_id and student_name:
+            sql, params = "SELECT * FROM students WHERE id=? AND name=? COLLATE NOCASE", (student_id, student_name)
+        elif student_id:
+            sql, params = "SELECT * FROM students WHERE id=?", (student_id,)
+        elif student_name:
+            sql, params = "SELECT * FROM students WHERE name=? COLLATE NOCASE", (student_name,)
+        else:
+            return []  
+
+        return list(self._cached(("student", student_id, student_name), lambda: self._fetch_all(sql, params)))
+    
+
+
+    
+    def search_students(self, query, limit = 20):
+        # Every word in the query must prefix-match a word of the name,
+        # so "ah al" finds "Ahmed Ali". Best matches come first.
+        tokens = re.findall(r"\w+", query or "")
+        if not tokens:
+            return []
+
+        if self.has_fts:
+            match = " ".join(f'"{token}"*' for token in tokens)
+            sql = """
+                SELECT s.* FROM students_fts f
+                JOIN students s ON s.id = f.rowid
+                WHERE students_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ?
+            """
+            params = (match, limit)
+        else:
+            where, params = self._build_filters({"name": " ".join(tokens)})
+            sql = f"SELECT * FROM students WHERE {where[0]} ORDER BY name LIMIT ?"
+            params = params + [limit]
+
+        return list(self._cached(("search", tuple(tokens), limit), lambda: self._fetch_all(sql, params)))
+
+
+
+
+    def suggest_students(self, text, limit = 20):
+        # Search-as-you-type: students whose name starts with `text`, in name
+        # order, read straight off idx_students_name so the cost depends on
+        # `limit`, not on the table size. If that gives fewer than `limit`,
+        # names with a later word starting with `text` fill the rest, once
+        # the last word typed has three or more characters.
+        text = (text or "").strip()
+
+        def load():
+            where, params = self._build_filters({"name": text})
+            clause = f"WHERE {where[0]}" if where else ""
+            students = self._fetch_all(f"SELECT * FROM students {clause} ORDER BY name COLLATE NOCASE, id LIMIT ?",
+                                       params + [limit])
+            tokens = re.findall(r"\w+", text)
+            if len(students) < limit and self.has_fts and tokens and len(tokens[-1]) >= 3:
+                seen = {s.id for s in students}
+                match = " ".join(f'"{token}"*' for token in tokens)
+                extra = self._fetch_all("""
+                    SELECT s.* FROM students_fts f
+                    JOIN students s ON s.id = f.rowid
+                    WHERE students_fts MATCH ?
+                    LIMIT ?
+                """, (match, limit + len(students)))
+                students += [s for s in extra if s.id not in seen][:limit - len(students)]
+            return students
+
+        return list(self._cached(("suggest", text.lower(), limit), load))
+
+
+
+
+    def update_student(self, student_id, **fields):
+        # Only the columns passed in are written; the id never changes.
+        columns = self._update_columns(fields)
+        if not columns:
+            return False
+        with self.pool.write() as conn:
+            cursor = conn.execute(f"UPDATE students SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                                  [fields[c] for c in columns] + [student_id])
+        self._changed("update", [student_id])
+        return cursor.rowcount == 1
+
+
+
+    def update_students(self, updates):
+        # updates is an iterable of (student_id, {column: value}). Rows that
+        # change the same set of columns share one executemany, and the
+        # whole batch is a single transaction.
+        groups = {}
+        ids = []
+        for student_id, fields in updates:
+            columns = self._update_columns(fields)
+            if columns:
+                groups.setdefault(columns, []).append([fields[c] for c in columns] + [student_id])
+                ids.append(student_id)
+
+        updated = 0
+        with self.pool.write() as conn:
+            for columns, rows in groups.items():
+                cursor = conn.executemany(f"UPDATE students SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                                          rows)
+                updated += cursor.rowcount
+        self._changed("update", ids)
+        return updated
+
+
+
+    def _update_columns(self, fields):
+        unknown = [c for c in fields if c not in UPDATABLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot update column(s): {', '.join(unknown)}")
+        return tuple(c for c in UPDATABLE_COLUMNS if c in fields)
+
+
+
+
+    def delete_student(self, student_id):
+        with self.pool.write() as conn:
+            conn.execute("DELETE FROM students WHERE id=?", (student_id,))
+        self._changed("delete", [student_id])
+
+
+
+    def delete_students(self, ids = None, filters = None, chunk_size = 500):
+        # Deletes the given ids, every student matching `filters` (as in
+        # _build_filters), or the ids that also match the filters, all in
+        # one transaction. Long id lists go in chunks of chunk_size.
+        # Returns the number of students deleted.
+        where, params = self._build_filters(filters)
+        if ids is None and not where:
+            raise ValueError("delete_students needs ids or at least one filter")
+
+        deleted = 0
+        deleted_ids = []
+        with self.pool.write() as conn:
+            if ids is None:
+                clause = " AND ".join(where)
+                deleted_ids = [row[0] for row in conn.execute(f"SELECT id FROM students WHERE {clause}", params)]
+                deleted = conn.execute(f"DELETE FROM students WHERE {clause}", params).rowcount
+            else:
+                ids = list(ids)
+                for start in range(0, len(ids), chunk_size):
+                    chunk = ids[start:start + chunk_size]
+                    clause = " AND ".join([f"id IN ({', '.join('?' * len(chunk))})"] + where)
+                    if where:
+                        chunk = [row[0] for row in conn.execute(f"SELECT id FROM students WHERE {clause}",
+                                                                chunk + params)]
+                        if not chunk:
+                            continue
+                        clause = f"id IN ({', '.join('?' * len(chunk))})"
+                    deleted += conn.execute(f"DELETE FROM students WHERE {clause}", chunk).rowcount
+                    deleted_ids.extend(chunk)
+        self._changed("delete", deleted_ids)
+        return deleted
+
+
+
+    def change_seq(self):
+        # Sequence number of the latest change to `students`, from any
+        # process. Read it before a full load, then poll changes_since()
+        # with it to stay current.
+        with self.pool.read() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'student_changes'").fetchone()
+        return row[0] if row else 0
+
+
+
+    def changes_since(self, seq = 0, limit = 1000):
+        # Returns up to `limit` changes after `seq`, oldest first, as
+        # (seq, event, Student) tuples; event is "insert", "update" or
+        # "delete". Inserts and updates carry the new values, deletes the
+        # last ones. Pass the last seq seen to get the next page. Raises
+        # ValueError if changes after `seq` have been pruned, in which case
+        # the consumer has to reload.
+        with self.pool.read() as conn:
+            rows = conn.execute("""
+                SELECT seq, event, student_id, name, age, grade FROM student_changes
+                WHERE seq > ? ORDER BY seq LIMIT ?
+            """, (seq, limit)).fetchall()
+            first = rows[0][0] if rows else None
+            if first is None:
+                latest = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'student_changes'").fetchone()
+                first = latest[0] + 1 if latest and latest[0] > seq else None
+
+        if first is not None and first > seq + 1:
+            raise ValueError(f"Changes after {seq} have been pruned; reload and resume from change_seq()")
+        return [(number, event, Student(student_id, name, age, grade))
+                for number, event, student_id, name, age, grade in rows]
+
+
+
+    def prune_changes(self, before_seq = None, keep_days = None, keep_rows = None, chunk_size = 50000):
+        # Drops changes older than before_seq (e.g. the lowest seq every
+        # consumer has reached), older than keep_days, or beyond the newest
+        # keep_rows; with several limits, the most recent cut-off wins.
+        # Deletes go in chunks of chunk_size, each its own transaction, so
+        # writers are not held up by a large backlog. Returns the number of
+        # entries removed.
+        if before_seq is None and keep_days is None and keep_rows is None:
+            raise ValueError("prune_changes needs before_seq, keep_days or keep_rows")
+
+        cutoffs = [] if before_seq is None else [before_seq]
+        if keep_rows is not None:
+            cutoffs.append(self.change_seq() - keep_rows + 1)
+        if keep_days is not None:
+            # seq and changed_at grow together, so the first recent entry
+            # marks where the old ones end.
+            with self.pool.read() as conn:
+                row = conn.execute("""
+                    SELECT seq FROM student_changes
+                    WHERE changed_at >= CAST(strftime('%s', 'now') AS INTEGER) - ?
+                    ORDER BY seq LIMIT 1
+                """, (int(keep_days * 86400),)).fetchone()
+            cutoffs.append(row[0] if row else self.change_seq() + 1)
+        cutoff = max(cutoffs)
+
+        removed = 0
+        while True:
+            with self.pool.write() as conn:
+                deleted = conn.execute("""
+                    DELETE FROM student_changes WHERE seq IN (
+                        SELECT seq FROM student_changes WHERE seq < ? ORDER BY seq LIMIT ?
+                    )
+                """, (cutoff, chunk_size)).rowcount
+            removed += deleted
+            if deleted < chunk_size:
+                return removed
+
+
+
+    def _iter_rows(self, sql, params = (), batch_size = 1000, row_factory = None):
+        # Yields lists of at most batch_size rows straight from the cursor,
+        # so the full result never has to be in memory at once.
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+
+    def _export_query(self, filters, limit = None):
+        where, params = self._build_filters(filters)
+        sql = "SELECT id, name, age, grade FROM students"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return sql, params
+
+
+
+    def iter_students(self, batch_size = 500, filters = None):
+        # Lazily yields Student records in id order, reading batch_size rows
+        # at a time. Close the generator (or exhaust it) to give the reader
+        # connection back to the pool.
+        sql, params = self._export_query(filters)
+        for rows in self._iter_rows(sql, params, batch_size, Student.from_row):
+            yield from rows
+
+
+
+    def fetch_columns(self, filters = None, batch_size = 5000):
+        # Column arrays for analytics, filled batch by batch without
+        # building a Student per row.
+        sql, params = self._export_query(filters)
+        columns = StudentColumns()
+        for rows in self._iter_rows(sql, params, batch_size):
+            columns.extend(rows)
+        return columns
+
+
+
+    def iter_export(self, format = "csv", filters = None, chunk_size = 5000, written = None, limit = None):
+        # Yields the export as byte chunks; used for csv and csv.gz. If
+        # `written` is a list, its first item counts the rows exported.
+        # `limit` stops after that many students, in id order.
+        sql, params = self._export_query(filters, limit)
+        yield from encode_csv(self._iter_rows(sql, params, chunk_size), format, written)
+
+
+
+    def export(self, destination, format = "csv", filters = None, chunk_size = 5000):
+        # Writes students matching `filters` to a path or binary file object
+        # and returns the number of rows written.
+        sql, params = self._export_query(filters)
+        return write_export(destination, self._iter_rows(sql, params, chunk_size), format)
+
+
+
+    def _cached(self, key, loader):
+        # Cached Student records are shared between callers: copy one
+        # (Student(*s)) before changing it.
+        if self.cache.max_entries > 0:
+            self._check_external_changes()
+        return self.cache.get_or_load(key, ("students",), loader)
+
+
+
+    def _check_external_changes(self):
+        # One lookup in sqlite_sequence: if the change log moved on without
+        # this object hearing about it, another process wrote.
+        seq = self.change_seq()
+        if seq != self._seen_seq:
+            self._seen_seq = seq
+            self._invalidate()
+
+
+
+    def _invalidate(self, table = "students"):
+        self.cache.invalidate(table)
+
+
+
+    def subscribe(self, listener):
+        # listener(event, ids) is called after every committed write made
+        # through this object; event is "insert", "update" or "delete".
+        self._listeners.append(listener)
+
+
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+
+
+    def _changed(self, event, ids):
+        # Inside an enclosing pool.write() (a group commit) the cache and
+        # the listeners only hear about the change once it is committed.
+        self.pool.after_commit(lambda: self._notify(event, ids))
+
+
+
+    def _notify(self, event, ids):
+        self._invalidate()
+        if ids:
+            for listener in list(self._listeners):
+                listener(event, ids)
+
+
+
+    def data_version(self, table = "students"):
+        # Increases every time a write, through this object or another
+        # process, changes `table`.
+        self._check_external_changes()
+        return self.cache.version(table)
+
+
+
+    def cache_info(self):
+        return self.cache.info()
+
+
+
+    def close(self):
+        self.pool.close()
+
+
+
+
+
+
     
\ No newline at end of file
@@ -0,0 +1,477 @@
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+SERVICE_ENV = "STUDENT_DB_SERVICE"
+SERVICE_KEY_ENV = "STUDENT_DB_SERVICE_KEY"
+
+READ_METHODS = ("fetch_students", "fetch_students_by_ids", "fetch_students_page", "count_students", "stats",
+                "fetch_student", "search_students", "suggest_students", "match_existing", "fetch_columns",
+                "data_version", "cache_info", "change_seq", "changes_since")
+WRITE_METHODS = ("insert_student", "insert_students", "update_student", "update_students", "delete_student",
+                 "delete_students", "prune_changes")
+ITER_METHODS = ("iter_students", "iter_export")
+STATS_METHODS = ("snapshot", "reset")
+
+
+def parse_address(text):
+    # "host:port" is TCP; anything else is a Unix socket path (or a Windows
+    # named pipe such as \\.\pipe\students).
+    host, _, port = text.rpartition(":")
+    if host and port.isdigit() and "/" not in text and "\\" not in text:
+        return (host, int(port))
+    return text
+
+
+def _family(address):
+    return "AF_INET" if isinstance(address, tuple) else ("AF_PIPE" if address.startswith("\\\\") else "AF_UNIX")
+
+
+class _WriteRequest:
+    __slots__ = ("method", "args", "kwargs", "result", "error", "events", "done")
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+        self.events = []
+        self.done = threading.Event()
+
+
+class DatabaseService:
+    # Owns one Database and serves it to RemoteDatabase clients over a Unix
+    # socket or localhost TCP, so several app processes share a single
+    # writer instead of contending for the SQLite file lock. Reads run on
+    # the connection's thread through the reader pool. Writes are queued to
+    # one writer thread that commits whatever has queued up together (group
+    # commit); each write runs in its own savepoint, so a failing one does
+    # not undo the others.
+    # The change log (Database.changes_since) is pruned every
+    # prune_interval seconds to the last change_retention_days days and at
+    # most change_retention_rows entries; None turns a limit off.
+    def __init__(self, database, address, authkey, max_batch = 256, commit_delay = 0.0, iter_batch = 500,
+                 change_retention_days = 7, change_retention_rows = None, prune_interval = 3600):
+        self.db = database
+        self.address = address
+        self.authkey = authkey
+        self.max_batch = max_batch
+        self.commit_delay = commit_delay
+        self.iter_batch = iter_batch
+        self._writes = queue.Queue()
+        self._collecting = None
+        self._listener = None
+        self._threads = []
+        self._closing = False
+        self._stopped = threading.Event()
+        self.change_retention_days = change_retention_days
+        self.change_retention_rows = change_retention_rows
+        self.prune_interval = prune_interval
+        database.subscribe(self._on_change)
+
+
+
+    def start(self):
+        if _family(self.address) == "AF_UNIX" and os.path.exists(self.address):
+            os.remove(self.address)
+        self._listener = Listener(self.address, family = _family(self.address), authkey = self.authkey)
+        self.address = self._listener.address
+        targets = [self._write_loop, self._accept_loop]
+        if self.change_retention_days is not None or self.change_retention_rows is not None:
+            targets.append(self._prune_loop)
+        for target in targets:
+            thread = threading.Thread(target = target, daemon = True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._closing:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+
+    def stop(self):
+        self._closing = True
+        self._stopped.set()
+        self._writes.put(None)
+        if self._listener is not None:
+            self._listener.close()
+        if _family(self.address) == "AF_UNIX" and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+
+    def _accept_loop(self):
+        while not self._closing:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closing:
+                    return
+                # A client that failed the authkey challenge.
+                continue
+            threading.Thread(target = self._serve, args = (conn,), daemon = True).start()
+
+
+
+    def _serve(self, conn):
+        iterators = {}
+        tokens = itertools.count(1)
+        try:
+            while True:
+                try:
+                    op, name, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok",) + self._handle(op, name, args, kwargs, iterators, tokens)
+                except Exception as e:
+                    reply = ("error", e)
+                try:
+                    conn.send(reply)
+                except Exception as e:
+                    # The result or exception could not be pickled.
+                    conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+        finally:
+            for iterator in iterators.values():
+                iterator.close()
+            conn.close()
+
+
+
+    def _handle(self, op, name, args, kwargs, iterators, tokens):
+        # Returns (result, change_events).
+        if op == "call" and name in READ_METHODS:
+            return getattr(self.db, name)(*args, **kwargs), []
+        if op == "call" and name in WRITE_METHODS:
+            request = _WriteRequest(name, args, kwargs)
+            self._writes.put(request)
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+            return request.result, request.events
+        if op == "iter_open" and name in ITER_METHODS:
+            token = next(tokens)
+            iterators[token] = getattr(self.db, name)(*args, **kwargs)
+            return token, []
+        if op == "iter_next":
+            items = list(itertools.islice(iterators[name], self.iter_batch))
+            done = len(items) < self.iter_batch
+            if done:
+                iterators.pop(name).close()
+            return (items, done), []
+        if op == "iter_close":
+            iterator = iterators.pop(name, None)
+            if iterator is not None:
+                iterator.close()
+            return None, []
+        if op == "stats" and name in STATS_METHODS:
+            stats = self.db.query_stats
+            return (getattr(stats, name)() if stats is not None else None), []
+        raise ValueError(f"Unsupported request {op} {name}")
+
+
+
+    def _write_loop(self):
+        while True:
+            request = self._writes.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.commit_delay
+            while len(batch) < self.max_batch:
+                try:
+                    request = self._writes.get(timeout = max(deadline - time.monotonic(), 0)) \
+                        if self.commit_delay else self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._writes.put(None)
+                    break
+                batch.append(request)
+            self._commit(batch)
+
+
+
+    def _prune_loop(self):
+        # Pruning goes through the write queue like any client write.
+        while not self._closing:
+            request = _WriteRequest("prune_changes", (), {"keep_days": self.change_retention_days,
+                                                         "keep_rows": self.change_retention_rows})
+            self._writes.put(request)
+            request.done.wait()
+            if request.error is not None:
+                print(f"Pruning the change log failed: {request.error}")
+            if self._stopped.wait(self.prune_interval):
+                return
+
+
+
+    def _commit(self, batch):
+        pool = self.db.pool
+        try:
+            with pool.write():
+                for request in batch:
+                    try:
+                        with pool.write():
+                            # Change events are delivered after the commit,
+                            # in order; this marker tells _on_change whose
+                            # they are.
+                            pool.after_commit(lambda request = request: setattr(self, "_collecting", request))
+                            request.result = getattr(self.db, request.method)(*request.args, **request.kwargs)
+                    except Exception as e:
+                        request.error = e
+        except Exception as e:
+            # The commit itself failed, so none of the batch was stored.
+            for request in batch:
+                request.error = request.error or e
+                request.events = []
+        finally:
+            self._collecting = None
+            for request in batch:
+                request.done.set()
+
+
+
+    def _on_change(self, event, ids):
+        if self._collecting is not None:
+            self._collecting.events.append((event, ids))
+
+
+
+
+class _RemoteStats:
+    # Stand-in for Database.query_stats: counters come from the service.
+    # thread_db_time() is the time this thread spent waiting on the
+    # service, which is what a page's database time is from the client.
+    def __init__(self, remote):
+        self.remote = remote
+        self._local = threading.local()
+
+    def snapshot(self):
+        return self.remote._request("stats", "snapshot") or {"methods": {}, "statements": {}, "slowest": [],
+                                                             "buckets_ms": []}
+
+    def reset(self):
+        self.remote._request("stats", "reset")
+
+    def thread_db_time(self):
+        return getattr(self._local, "db_time", 0.0)
+
+    def _add(self, elapsed):
+        self._local.db_time = self.thread_db_time() + elapsed
+
+
+
+
+class RemoteDatabase:
+    # Client for DatabaseService with the same methods as Database.
+    # Listeners passed to subscribe() hear about writes made through this
+    # client, as with Database. Connections are pooled, so one
+    # RemoteDatabase can be shared by threads.
+    def __init__(self, address, authkey, max_connections = 8):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = authkey
+        self.max_connections = max_connections
+        self._connections = queue.LifoQueue()
+        self._connection_count = 0
+        self._connection_lock = threading.Lock()
+        self._listeners = []
+        self.query_stats = _RemoteStats(self)
+
+
+
+    def _acquire(self):
+        try:
+            return self._connections.get_nowait()
+        except queue.Empty:
+            pass
+        with self._connection_lock:
+            if self._connection_count < self.max_connections:
+                self._connection_count += 1
+                try:
+                    return Client(self.address, family = _family(self.address), authkey = self.authkey)
+                except BaseException:
+                    self._connection_count -= 1
+                    raise
+        return self._connections.get()
+
+
+
+    def _release(self, conn, broken = False):
+        if broken:
+            # The connection may be half-way through a message; drop it.
+            conn.close()
+            with self._connection_lock:
+                self._connection_count -= 1
+        else:
+            self._connections.put(conn)
+
+
+
+    def _exchange(self, conn, op, name, args = (), kwargs = {}):
+        start = time.perf_counter()
+        try:
+            conn.send((op, name, args, kwargs))
+            reply = conn.recv()
+        except BaseException:
+            self._release(conn, broken = True)
+            raise
+        self.query_stats._add(time.perf_counter() - start)
+        return reply
+
+
+
+    def _result(self, reply):
+        if reply[0] == "error":
+            raise reply[1]
+        _, result, events = reply
+        for event, ids in events:
+            for listener in list(self._listeners):
+                listener(event, ids)
+        return result
+
+
+
+    def _request(self, op, name, *args, **kwargs):
+        conn = self._acquire()
+        reply = self._exchange(conn, op, name, args, kwargs)
+        self._release(conn)
+        return self._result(reply)
+
+
+
+    def __getattr__(self, name):
+        if name not in READ_METHODS and name not in WRITE_METHODS:
+            raise AttributeError(f"RemoteDatabase has no method '{name}'")
+
+        def call(*args, **kwargs):
+            return self._request("call", name, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
+
+    def _iterate(self, name, *args, **kwargs):
+        # The service keeps open iterators per connection, so one
+        # connection is held until the iteration ends.
+        conn = self._acquire()
+        reply = self._exchange(conn, "iter_open", name, args, kwargs)
+        if reply[0] == "error":
+            self._release(conn)
+        token = self._result(reply)
+
+        done = False
+        try:
+            while not done:
+                items, done = self._result(self._exchange(conn, "iter_next", token))
+                yield from items
+        finally:
+            # A connection that failed mid-message was dropped by _exchange.
+            if not conn.closed:
+                if not done:
+                    self._exchange(conn, "iter_close", token)
+                self._release(conn)
+
+
+
+    def iter_students(self, batch_size = 500, filters = None):
+        return self._iterate("iter_students", batch_size = batch_size, filters = filters)
+
+
+
+    def iter_export(self, format = "csv", filters = None, chunk_size = 5000, limit = None):
+        return self._iterate("iter_export", format = format, filters = filters, chunk_size = chunk_size,
+                             limit = limit)
+
+
+
+    def export(self, destination, format = "csv", filters = None, chunk_size = 5000):
+        # Same as Database.export, but the file is written by this process
+        # from rows streamed out of the service, so paths and file objects
+        # are the caller's own.
+        from database import write_export
+        students = self.iter_students(batch_size = chunk_size, filters = filters)
+        try:
+            chunks = iter(lambda: [tuple(s) for s in itertools.islice(students, chunk_size)], [])
+            return write_export(destination, chunks, format)
+        finally:
+            students.close()
+
+
+
+    def subscribe(self, listener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+
+
+    def close(self):
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+
+
+def main(argv = None):
+    from database import Database
+    from instrumentation import QueryStats
+
+    parser = argparse.ArgumentParser(description = "Serve students.db to several app processes.")
+    parser.add_argument("--db", default = "students.db")
+    parser.add_argument("--address", default = "students.sock",
+                        help = "Unix socket path, or host:port for TCP (e.g. 127.0.0.1:7070)")
+    parser.add_argument("--max-batch", type = int, default = 256, help = "most writes per group commit")
+    parser.add_argument("--commit-delay-ms", type = float, default = 0.0,
+                        help = "wait this long for more writes before committing a group")
+    parser.add_argument("--slow-query-log", default = "slow_queries.log")
+    parser.add_argument("--change-retention-days", type = float, default = 7,
+                        help = "prune change log entries older than this (0 = keep all)")
+    parser.add_argument("--change-retention-rows", type = int, default = 0,
+                        help = "keep at most this many change log entries (0 = no limit)")
+    parser.add_argument("--prune-interval", type = float, default = 3600, help = "seconds between prunes")
+    args = parser.parse_args(argv)
+
+    authkey = os.environ.get(SERVICE_KEY_ENV)
+    if not authkey:
+        parser.error(f"set {SERVICE_KEY_ENV} to the shared secret clients will use")
+
+    stats = QueryStats(log_path = args.slow_query_log)
+    service = DatabaseService(Database(args.db, query_stats = stats), parse_address(args.address),
+                              authkey.encode(), max_batch = args.max_batch,
+                              commit_delay = args.commit_delay_ms / 1000,
+                              change_retention_days = args.change_retention_days or None,
+                              change_retention_rows = args.change_retention_rows or None,
+                              prune_interval = args.prune_interval)
+    print(f"Serving {args.db} on {args.address}")
+    service.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
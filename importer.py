@@ -0,0 +1,372 @@
+import argparse
+import csv
+import io
+import os
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from student import Student
+
+REQUIRED_COLUMNS = ['Name', 'Age', 'Grade']
+REPORT_COLUMNS = ['Line', 'Error'] + REQUIRED_COLUMNS
+MIN_AGE = 1
+MAX_AGE = 100
+
+
+class ImportResult:
+    def __init__(self, max_errors = 1000, report = None):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.report = report
+        # Only run_parallel tracks how far into the file it has got.
+        self.bytes_read = 0
+
+    def add_error(self, line_no, row, message):
+        # Only the first max_errors are kept so a file full of bad rows
+        # cannot grow memory without bound. The error report, if any, gets
+        # every one.
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_no, row, message))
+        if self.report is not None:
+            self.report.writerow({**row, 'Line': line_no, 'Error': message})
+
+    @property
+    def processed(self):
+        return self.inserted + self.rejected
+
+
+class CSVImporter:
+    def __init__(self, database, chunk_size = 5000, validator = None):
+        self.db = database
+        self.chunk_size = chunk_size
+        # Optional UploadValidator. When set, run() reads the file with it and
+        # checks each chunk as a whole (grade whitelist, duplicates) instead
+        # of calling coerce_row per row.
+        self.validator = validator
+
+
+
+    def _open(self, source):
+        if isinstance(source, str):
+            return open(source, 'r', newline = '', encoding = 'utf-8-sig'), True
+        if isinstance(source, io.TextIOBase):
+            return source, False
+        # Binary file-like object, e.g. a Streamlit UploadedFile.
+        return io.TextIOWrapper(source, encoding = 'utf-8-sig', newline = ''), False
+
+
+
+    def _reader(self, handle):
+        reader = csv.DictReader(handle)
+        missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV must contain columns: {', '.join(REQUIRED_COLUMNS)}. "
+                             f"Found: {', '.join(reader.fieldnames or [])}")
+        return reader
+
+
+
+    def _release(self, handle, owned):
+        if owned:
+            handle.close()
+        elif isinstance(handle, io.TextIOWrapper):
+            # Leave the caller's binary stream open.
+            handle.detach()
+
+
+
+    def preview(self, source, rows = 10):
+        handle, owned = self._open(source)
+        try:
+            reader = csv.reader(handle)
+            columns = next(reader, [])
+            return columns, list(islice(reader, rows))
+        finally:
+            self._release(handle, owned)
+
+
+
+    def read_chunks(self, source):
+        # Yields lists of (line_no, row) with at most chunk_size rows each.
+        handle, owned = self._open(source)
+        try:
+            reader = self._reader(handle)
+            chunk = []
+            for row in reader:
+                chunk.append((reader.line_num, row))
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            self._release(handle, owned)
+
+
+
+    def coerce_row(self, row):
+        name, age, grade = coerce_fields(row)
+        return Student(name = name, age = age, grade = grade)
+
+
+
+    def validate_chunk(self, chunk, result):
+        if self.validator is not None:
+            return self._collect(*self.validator.validate_rows(chunk), result)
+
+        students = []
+        lines = []
+        for line_no, row in chunk:
+            try:
+                students.append(self.coerce_row(row))
+                lines.append((line_no, row))
+            except ValueError as e:
+                result.add_error(line_no, row, str(e))
+        return students, lines
+
+
+
+    def _collect(self, valid, invalid, result):
+        # Turns a validator's (valid, invalid) rows into what _insert takes.
+        for line_no, row, message in invalid:
+            result.add_error(line_no, row, message)
+        students = []
+        lines = []
+        for line_no, name, age, grade in valid:
+            students.append(Student(name = name, age = age, grade = grade))
+            lines.append((line_no, {'Name': name, 'Age': age, 'Grade': grade}))
+        return students, lines
+
+
+
+    def run(self, source, progress = None, max_errors = 1000, error_report = None):
+        with _error_report(error_report) as report:
+            result = ImportResult(max_errors, report)
+
+            if self.validator is not None:
+                batches = (self._collect(*self.validator.validate_frame(frame), result)
+                           for frame in self.validator.read_frames(source, self.chunk_size))
+            else:
+                batches = (self.validate_chunk(chunk, result) for chunk in self.read_chunks(source))
+
+            for students, lines in batches:
+                self._insert(students, lines, result)
+                if progress:
+                    progress(result)
+
+        return result
+
+
+
+    def _insert(self, students, lines, result):
+        inserted, failed = self.db.insert_students(students, batch_size = len(students) or 1)
+        result.inserted += inserted
+        for index, student, error in failed:
+            line_no, row = lines[index]
+            result.add_error(line_no, row, error)
+
+
+
+    def split_ranges(self, path, range_bytes = 1 << 22):
+        # Returns the header columns and (start, end) byte ranges covering
+        # the data rows. Every range ends on a line break, so each can be
+        # parsed on its own. A quoted field containing a line break may
+        # still be cut in two; use run() for files that have them.
+        with open(path, 'rb') as file:
+            header = file.readline()
+            columns = next(csv.reader([header.decode('utf-8-sig')]), [])
+            missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+            if missing:
+                raise ValueError(f"CSV must contain columns: {', '.join(REQUIRED_COLUMNS)}. "
+                                 f"Found: {', '.join(columns)}")
+
+            size = os.fstat(file.fileno()).st_size
+            ranges = []
+            start = file.tell()
+            while start < size:
+                file.seek(min(start + range_bytes, size))
+                file.readline()
+                end = file.tell()
+                ranges.append((start, end))
+                start = end
+        return columns, ranges
+
+
+
+    def run_parallel(self, path, workers = None, range_bytes = 1 << 22, progress = None,
+                     max_errors = 1000, error_report = None):
+        # Same result as run(), but parsing (and, without a validator,
+        # validation) of the byte ranges from split_ranges() is spread over
+        # a process pool. The calling process is the only writer: it
+        # inserts each range's clean rows in file order as the workers
+        # finish them. A validator needs the database, so with one the
+        # workers only parse and the rows are validated here, as run()
+        # would.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        columns, ranges = self.split_ranges(path, range_bytes)
+        workers = workers or os.cpu_count() or 1
+        coerce = self.validator is None
+        line_base = 1
+        # Workers are spawned, not forked: the app calls this from a
+        # threaded server, and forking a process with live threads can
+        # leave locks held in the child.
+        context = multiprocessing.get_context("spawn")
+
+        with _error_report(error_report) as report, ProcessPoolExecutor(workers, mp_context = context) as pool:
+            result = ImportResult(max_errors, report)
+            pending = deque()
+
+            def collect():
+                nonlocal line_base
+                end, valid, invalid, line_count = pending.popleft().result()
+                for line_no, row, message in invalid:
+                    result.add_error(line_base + line_no, row, message)
+                if coerce:
+                    students = [Student(name = name, age = age, grade = grade) for _, _, name, age, grade in valid]
+                    lines = [(line_base + line_no, row) for line_no, row, _, _, _ in valid]
+                else:
+                    students, lines = self._collect(*self.validator.validate_rows(
+                        (line_base + line_no, row) for line_no, row in valid), result)
+                self._insert(students, lines, result)
+                line_base += line_count
+                result.bytes_read = end
+                if progress:
+                    progress(result)
+
+            # At most two ranges per worker are parsed ahead of the writer.
+            for start, end in ranges:
+                pending.append(pool.submit(_validate_range, path, start, end, columns, coerce))
+                if len(pending) >= 2 * workers:
+                    collect()
+            while pending:
+                collect()
+
+        return result
+
+
+
+
+def coerce_fields(row):
+    name = (row.get('Name') or '').strip()
+    grade = (row.get('Grade') or '').strip()
+    age_text = (row.get('Age') or '').strip()
+
+    if not name:
+        raise ValueError("missing Name")
+    if not grade:
+        raise ValueError("missing Grade")
+    if not age_text:
+        raise ValueError("missing Age")
+
+    try:
+        age = int(age_text)
+    except ValueError:
+        try:
+            age_float = float(age_text)
+        except ValueError:
+            raise ValueError(f"Age '{age_text}' is not a number")
+        if not age_float.is_integer():
+            raise ValueError(f"Age '{age_text}' is not a whole number")
+        age = int(age_float)
+
+    if not MIN_AGE <= age <= MAX_AGE:
+        raise ValueError(f"Age {age} is outside {MIN_AGE}-{MAX_AGE}")
+
+    return name, age, grade
+
+
+
+def _validate_range(path, start, end, columns, coerce = True):
+    # Runs in a worker process. Line numbers are relative to the start of
+    # the range; the parent adds the offset once earlier ranges are counted.
+    # Valid rows keep the original row for the error report, followed by
+    # the coerced fields unless `coerce` is false.
+    with open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8'), newline = ''), fieldnames = columns)
+    valid = []
+    invalid = []
+    for row in reader:
+        if not coerce:
+            valid.append((reader.line_num, row))
+            continue
+        try:
+            valid.append((reader.line_num, row) + coerce_fields(row))
+        except ValueError as e:
+            invalid.append((reader.line_num, row, str(e)))
+    return end, valid, invalid, data.count(b'\n')
+
+
+
+@contextmanager
+def _error_report(path):
+    # CSV of every rejected row: its line number, the reason, and the
+    # original Name, Age and Grade.
+    if path is None:
+        yield None
+        return
+    with open(path, 'w', newline = '', encoding = 'utf-8') as file:
+        report = csv.DictWriter(file, fieldnames = REPORT_COLUMNS, extrasaction = 'ignore')
+        report.writeheader()
+        yield report
+
+
+
+
+def add_arguments(parser):
+    # Shared with the "import" command of cli.py.
+    parser.add_argument("csv_file")
+    parser.add_argument("--chunk-size", type = int, default = 5000)
+    parser.add_argument("--workers", type = int, default = 0,
+                        help = "validate on this many processes (0 = in this process)")
+    parser.add_argument("--error-report", help = "write every rejected row to this CSV file")
+    parser.add_argument("--validate", action = "store_true",
+                        help = "normalise rows and skip duplicate students (needs pandas)")
+    parser.add_argument("--letter-grades", action = "store_true",
+                        help = "with --validate, only accept letter grades A+ to F")
+
+
+
+
+def import_csv(db, args):
+    validator = None
+    if args.validate:
+        from upload_validator import UploadValidator, VALID_GRADES
+        validator = UploadValidator(db, valid_grades = VALID_GRADES if args.letter_grades else None)
+    importer = CSVImporter(db, chunk_size = args.chunk_size, validator = validator)
+
+    def report(result):
+        print(f"Processed {result.processed} rows...", end = "\r")
+
+    if args.workers:
+        result = importer.run_parallel(args.csv_file, workers = args.workers, progress = report,
+                                       error_report = args.error_report)
+    else:
+        result = importer.run(args.csv_file, progress = report, error_report = args.error_report)
+    print(f"Added: {result.inserted}, Errors: {result.rejected}")
+    for line_no, row, message in result.errors:
+        print(f"  line {line_no}: {message}")
+    return 0 if result.rejected == 0 else 1
+
+
+
+
+def main(argv = None):
+    from database import Database
+
+    parser = argparse.ArgumentParser(description = "Import students from a CSV file.")
+    parser.add_argument("--db", default = "students.db")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    return import_csv(Database(args.db), args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
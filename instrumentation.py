@@ -0,0 +1,336 @@
+import bisect
+import functools
+import heapq
+import inspect
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; the
+# last bucket counts everything slower.
+HISTOGRAM_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def normalize_sql(sql):
+    # One entry per statement shape: whitespace collapsed and placeholder
+    # lists of any length folded, so "IN (?, ?)" and "IN (?, ?, ?)" agree.
+    sql = " ".join(sql.split())
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", sql)
+
+
+class _Timing:
+    __slots__ = ("calls", "errors", "rows", "total", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def add(self, elapsed, rows = 0, error = False):
+        self.calls += 1
+        self.errors += error
+        self.rows += rows
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, elapsed * 1000)] += 1
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "histogram": list(self.buckets),
+        }
+
+
+class QueryStats:
+    # Counters for Database methods and the SQL statements they run.
+    # Statements slower than slow_ms are explained with EXPLAIN QUERY PLAN,
+    # kept in a top-N list and, if log_path is set, appended to a rotating
+    # slow-query log.
+    def __init__(self, slow_ms = 100, top_n = 20, log_path = None, max_bytes = 5_000_000, backup_count = 3):
+        self.slow_ms = slow_ms
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._methods = defaultdict(_Timing)
+        self._statements = defaultdict(_Timing)
+        self._slowest = []
+        self._plans = {}
+        self._explain_conn = None
+        self._explain_lock = threading.Lock()
+        self._local = threading.local()
+        self.db_name = None
+
+        self.log = None
+        if log_path:
+            self.log = logging.getLogger(f"student_db.slow_queries.{id(self)}")
+            self.log.setLevel(logging.INFO)
+            self.log.propagate = False
+            handler = RotatingFileHandler(log_path, maxBytes = max_bytes, backupCount = backup_count,
+                                          encoding = "utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.log.addHandler(handler)
+
+
+
+    def instrument(self, obj, names):
+        # Replaces each named method on `obj` with a timed wrapper.
+        # Generator methods are timed until the caller stops iterating.
+        for name in names:
+            method = getattr(obj, name)
+            if inspect.isgeneratorfunction(method):
+                setattr(obj, name, self._wrap_generator(name, method))
+            else:
+                setattr(obj, name, self._wrap(name, method))
+
+
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            error = True
+            try:
+                result = method(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                self.record_method(name, time.perf_counter() - start, error)
+        return timed
+
+
+
+    def _wrap_generator(self, name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            elapsed = 0.0
+            error = True
+            generator = method(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        error = False
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            except GeneratorExit:
+                error = False
+                raise
+            finally:
+                generator.close()
+                self.record_method(name, elapsed, error)
+        return timed
+
+
+
+    def record_method(self, name, elapsed, error = False):
+        with self._lock:
+            self._methods[name].add(elapsed, error = error)
+
+
+
+    def record_statement(self, sql, params, elapsed, rows, error = False):
+        key = normalize_sql(sql)
+        self._local.db_time = getattr(self._local, "db_time", 0.0) + elapsed
+        with self._lock:
+            self._statements[key].add(elapsed, rows, error)
+        if elapsed * 1000 >= self.slow_ms:
+            self._record_slow(key, sql, params, elapsed, rows)
+
+
+
+    def _record_slow(self, key, sql, params, elapsed, rows):
+        plan = self.explain(key, sql, params)
+        entry = {
+            "ms": round(elapsed * 1000, 3),
+            "sql": key,
+            "params": repr(params)[:200],
+            "rows": rows,
+            "plan": plan,
+            "at": datetime.now().isoformat(timespec = "seconds"),
+        }
+        with self._lock:
+            item = (elapsed, id(entry), entry)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, item)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+        if self.log is not None:
+            self.log.info("%.1f ms, %d rows: %s params=%s plan=%s",
+                          entry["ms"], rows, key, entry["params"], " | ".join(plan))
+
+
+
+    def explain(self, key, sql, params):
+        # Plans are looked up once per statement shape, on a connection of
+        # their own so the query's connection is left alone.
+        if key in self._plans:
+            return self._plans[key]
+        if not sql.lstrip().upper().startswith(EXPLAINABLE) or self.db_name is None:
+            return []
+
+        with self._explain_lock:
+            try:
+                if self._explain_conn is None:
+                    self._explain_conn = sqlite3.connect(self.db_name, check_same_thread = False)
+                plan = [row[3] for row in self._explain_conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())]
+            except sqlite3.Error as e:
+                plan = [f"unavailable: {e}"]
+        self._plans[key] = plan
+        return plan
+
+
+
+    def thread_db_time(self):
+        # Seconds of SQL this thread has run so far; take differences to
+        # time a stretch of work.
+        return getattr(self._local, "db_time", 0.0)
+
+
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "methods": {name: timing.as_dict() for name, timing in self._methods.items()},
+                "statements": {sql: timing.as_dict() for sql, timing in self._statements.items()},
+                "slowest": [entry for _, _, entry in sorted(self._slowest, reverse = True)],
+                "buckets_ms": list(HISTOGRAM_BUCKETS_MS),
+            }
+
+
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._statements.clear()
+            self._slowest = []
+
+
+
+    def close(self):
+        with self._explain_lock:
+            if self._explain_conn is not None:
+                self._explain_conn.close()
+                self._explain_conn = None
+        if self.log is not None:
+            for handler in list(self.log.handlers):
+                handler.close()
+                self.log.removeHandler(handler)
+
+
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Times each statement while SQLite works on it: execute() plus every
+    # fetch until the rows run out, the cursor runs another statement or it
+    # is closed. Time the caller spends between fetches is not counted.
+    _sql = None
+
+    def execute(self, sql, parameters = ()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters, ())
+
+    def _run(self, execute, sql, parameters, logged_parameters = None):
+        self._finish()
+        self._sql = sql
+        self._params = parameters if logged_parameters is None else logged_parameters
+        self._rows = 0
+        self._elapsed = 0.0
+        try:
+            self._timed(execute, sql, parameters)
+        except BaseException:
+            self._finish(error = True)
+            raise
+        if self.description is None:
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def _timed(self, call, *args):
+        start = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            if self._sql is not None:
+                self._elapsed += time.perf_counter() - start
+
+    def _fetched(self, rows, done):
+        if self._sql is not None:
+            self._rows += rows
+            if done:
+                self._finish()
+
+    def _finish(self, error = False):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        stats = self.connection.stats
+        if stats is not None:
+            stats.record_statement(sql, self._params, self._elapsed, self._rows, error)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        self._fetched(row is not None, row is None)
+        return row
+
+    def fetchmany(self, size = None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        self._fetched(len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._fetched(len(rows), True)
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._fetched(0, True)
+            raise
+        self._fetched(1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # sqlite3 connection whose cursors report to `self.stats`.
+    stats = None
+
+    def cursor(self, factory = InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters = ()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
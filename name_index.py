@@ -0,0 +1,197 @@
+import math
+import threading
+from array import array
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import chain
+
+EMPTY = array("q")
+
+
+def _normalize(name):
+    return " ".join(str(name or "").lower().split())
+
+
+def trigrams(name):
+    padded = f"  {_normalize(name)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    # In-memory trigram index over student names for typo-tolerant lookup.
+    # Attach it to a Database and it follows inserts, updates and deletes
+    # made through that Database instead of being rebuilt per query.
+    # Postings are append-only arrays of ids (8 bytes an entry): removing
+    # or renaming a student leaves its old entries behind until they make
+    # up half of all entries, and search() scores every candidate against
+    # its current name.
+    def __init__(self, database = None, min_similarity = 0.4, scan_budget = 20000):
+        self.min_similarity = min_similarity
+        self.scan_budget = scan_budget
+        self._names = {}
+        self._postings = defaultdict(partial(array, "q"))
+        # Ids held by all postings, and how many of those are left behind.
+        self._entries = 0
+        self._stale = 0
+        self._lock = threading.RLock()
+        self.db = None
+        # Last change_seq() applied; see refresh().
+        self.seq = 0
+        if database is not None:
+            self.attach(database)
+
+
+
+    def attach(self, database, batch_size = 5000):
+        self.db = database
+        database.subscribe(self._on_change)
+        with self._lock:
+            self._load(batch_size)
+
+
+
+    def _load(self, batch_size):
+        # Changes committed during the load are replayed by the next
+        # refresh(); applying one twice is harmless.
+        self.seq = self.db.change_seq()
+        for student in self.db.iter_students(batch_size = batch_size):
+            # Loads start from an empty index, so there is nothing to replace.
+            self._names[student.id] = student.name
+            self._post(student.id, student.name)
+
+
+
+    def refresh(self, batch_size = 1000):
+        # Applies changes made since the last refresh, including writes
+        # from other processes that subscribe() never hears about. Reads
+        # only the change log, so it costs O(changes), not O(students).
+        with self._lock:
+            while True:
+                try:
+                    changes = self.db.changes_since(self.seq, limit = batch_size)
+                except ValueError:
+                    # The log was pruned past our position: start over.
+                    self._names.clear()
+                    self._compact()
+                    self._load(5000)
+                    return
+                for seq, event, student in changes:
+                    if event == "delete":
+                        self.remove(student.id)
+                    else:
+                        self.add(student.id, student.name)
+                    self.seq = seq
+                if len(changes) < batch_size:
+                    return
+
+
+
+    def detach(self):
+        if self.db is not None:
+            self.db.unsubscribe(self._on_change)
+            self.db = None
+
+
+
+    def _on_change(self, event, ids):
+        # Writes made through the attached Database are applied from the
+        # change log right away, so lookups find nothing left to replay.
+        # Skipped while a load or refresh holds the index; the next
+        # refresh() picks the write up from the log.
+        if self._lock.acquire(blocking = False):
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+
+
+
+    def add(self, student_id, name):
+        with self._lock:
+            self.remove(student_id)
+            self._names[student_id] = name
+            self._post(student_id, name)
+
+
+
+    def _post(self, student_id, name):
+        grams = trigrams(name)
+        for gram in grams:
+            self._postings[gram].append(student_id)
+        self._entries += len(grams)
+
+
+
+    def remove(self, student_id):
+        with self._lock:
+            name = self._names.pop(student_id, None)
+            if name is None:
+                return
+            self._stale += len(trigrams(name))
+            if self._stale * 2 > self._entries:
+                self._compact()
+
+
+
+    def _compact(self):
+        # Rebuilds the postings from the live names only.
+        self._postings.clear()
+        self._entries = 0
+        self._stale = 0
+        for student_id, name in self._names.items():
+            self._post(student_id, name)
+
+
+
+    def __len__(self):
+        return len(self._names)
+
+
+
+    def search(self, query, limit = 10, min_similarity = None):
+        # Returns [(student_id, name, similarity)], best first. Similarity
+        # is the Dice coefficient of the two trigram sets.
+        min_similarity = self.min_similarity if min_similarity is None else min_similarity
+        query_grams = trigrams(query)
+        if not _normalize(query):
+            return []
+
+        with self._lock:
+            postings = sorted((self._postings.get(g, EMPTY) for g in query_grams), key = len)
+
+            # A name reaching min_similarity shares at least `needed` trigrams
+            # with the query, so it appears in one of the len - needed + 1
+            # shortest posting lists. Those are counted rarest first until
+            # scan_budget ids have been read; very common trigrams (a popular
+            # first name) would only add to candidates already found through
+            # rarer ones.
+            needed = max(1, math.ceil(min_similarity * len(query_grams) / 2))
+            scan = []
+            scanned = 0
+            for posting in postings[:len(postings) - needed + 1]:
+                if scanned + len(posting) > self.scan_budget:
+                    if scan:
+                        break
+                    # Even the rarest trigram is everywhere; any sample of
+                    # its names is as good a start as another.
+                    posting = posting[:self.scan_budget]
+                scan.append(posting)
+                scanned += len(posting)
+            counts = Counter(chain.from_iterable(scan))
+
+            # The names sharing the most rare trigrams are scored exactly,
+            # which also skips entries left behind by removals and renames.
+            probe_limit = max(limit * 20, 100)
+            candidates = counts.most_common(probe_limit) if len(counts) > probe_limit else counts.items()
+            results = []
+            for student_id, _ in candidates:
+                name = self._names.get(student_id)
+                if name is None:
+                    continue
+                grams = trigrams(name)
+                similarity = 2 * len(grams & query_grams) / (len(grams) + len(query_grams))
+                if similarity >= min_similarity:
+                    results.append((student_id, name, similarity))
+
+        results.sort(key = lambda r: (-r[2], r[1]))
+        return results[:limit]
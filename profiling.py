@@ -0,0 +1,102 @@
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+PROFILE_ENV = "STUDENT_DB_PROFILE"
+PROFILE_DIR_ENV = "STUDENT_DB_PROFILE_DIR"
+
+
+class PageProfiler:
+    # Opt-in profiling of Streamlit page functions, one record per rerun.
+    # Set STUDENT_DB_PROFILE=1 to enable it; output goes to
+    # STUDENT_DB_PROFILE_DIR (default "profiles"):
+    #   reruns.jsonl             wall, DB and render time and allocations
+    #                            of every rerun of a profiled page
+    #   <session>-<page>.prof    cProfile stats per session and page,
+    #                            accumulated over its reruns (open with pstats)
+    # When disabled, page() returns the function unchanged.
+    def __init__(self, output_dir = "profiles", query_stats = None, session_id = None, enabled = True):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.query_stats = query_stats
+        # Callable returning the current user's session key.
+        self.session_id = session_id or (lambda: "default")
+        self._profiles = {}
+        self._lock = threading.Lock()
+        if enabled:
+            os.makedirs(output_dir, exist_ok = True)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+
+
+    @classmethod
+    def from_env(cls, query_stats = None, session_id = None):
+        enabled = os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+        return cls(os.environ.get(PROFILE_DIR_ENV, "profiles"), query_stats, session_id, enabled)
+
+
+
+    def page(self, fn):
+        if not self.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def profiled(*args, **kwargs):
+            return self._run(fn.__name__, fn, args, kwargs)
+        return profiled
+
+
+
+    def _run(self, page, fn, args, kwargs):
+        session = re.sub(r"[^\w-]", "_", str(self.session_id()))
+        with self._lock:
+            profile = self._profiles.setdefault((session, page), cProfile.Profile())
+
+        # DB time is SQLite time on this thread, as counted by QueryStats.
+        db_before = self.query_stats.thread_db_time() if self.query_stats else None
+        # tracemalloc counts every thread, so allocations of sessions
+        # rerunning at the same moment show up in each other's numbers.
+        memory_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        try:
+            profile.enable()
+            profiling = True
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; this
+            # rerun is timed but not profiled.
+            profiling = False
+
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - start
+            if profiling:
+                profile.disable()
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            db = self.query_stats.thread_db_time() - db_before if self.query_stats else None
+
+            record = {
+                "at": datetime.now().isoformat(timespec = "milliseconds"),
+                "session": session,
+                "page": page,
+                "wall_ms": round(wall * 1000, 3),
+                "db_ms": round(db * 1000, 3) if db is not None else None,
+                "render_ms": round((wall - db) * 1000, 3) if db is not None else None,
+                "alloc_peak_kb": round((memory_peak - memory_before) / 1024, 1),
+                "alloc_net_kb": round((memory_after - memory_before) / 1024, 1),
+                "profiled": profiling,
+            }
+            with self._lock:
+                with open(os.path.join(self.output_dir, "reruns.jsonl"), 'a') as file:
+                    file.write(json.dumps(record) + "\n")
+                if profiling:
+                    profile.dump_stats(os.path.join(self.output_dir, f"{session}-{page}.prof"))
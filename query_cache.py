@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    # LRU cache for read query results. Each entry remembers the version of
+    # the tables it was read from; bumping a table's version makes every
+    # entry built from it stale without touching the others.
+    def __init__(self, max_entries = 256, max_rows = 10000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+
+
+    def get_or_load(self, key, tables, loader):
+        if self.max_entries <= 0:
+            return loader()
+
+        with self._lock:
+            versions = tuple(self._versions.get(t, 0) for t in tables)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = loader()
+
+        # Results that are too big to be worth holding are passed through.
+        if _size(value) <= self.max_rows:
+            with self._lock:
+                self._entries[key] = (versions, tables, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last = False)
+        return value
+
+
+
+    def invalidate(self, table):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            for key in [k for k, entry in self._entries.items() if table in entry[1]]:
+                del self._entries[key]
+
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+
+    def info(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0,
+                    "size": len(self._entries),
+                    "max_entries": self.max_entries,
+                    "versions": dict(self._versions)}
+
+
+def _size(value):
+    if isinstance(value, tuple) and value and isinstance(value[0], list):
+        return len(value[0])
+    if isinstance(value, list):
+        return len(value)
+    return 1
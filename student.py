@@ -1,17 +1,91 @@
-class Student:
-    def __init__(self, student_id = None, name = None, age = None, grade = None):
-        self.id = student_id
-        self.name = name
-        self.age = age
-        self.grade = grade
-
-        
-
-    def update(self, name = None, age = None, grade = None): 
-        if name: 
-            self.name = name 
-        if age: 
-            self.age = age 
-        if grade: 
-            self.grade = grade
-
+from array import array
+
+class Student:
+    # __slots__ keeps each record small when a query returns many rows.
+    # Students also behave like the (id, name, age, grade) tuples the
+    # database used to return, so s[1] and tuple(s) still work.
+    __slots__ = ("id", "name", "age", "grade")
+
+    def __init__(self, student_id = None, name = None, age = None, grade = None):
+        self.id = student_id
+        self.name = name
+        self.age = age
+        self.grade = grade
+
+
+
+    def update(self, name = None, age = None, grade = None):
+        if name:
+            self.name = name
+        if age:
+            self.age = age
+        if grade:
+            self.grade = grade
+
+
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        # sqlite3 row factory: builds the Student straight from the cursor.
+        student = cls.__new__(cls)
+        student.id, student.name, student.age, student.grade = row
+        return student
+
+
+
+    @staticmethod
+    def columns(rows):
+        return StudentColumns(rows)
+
+
+
+    def __iter__(self):
+        return iter((self.id, self.name, self.age, self.grade))
+
+    def __getitem__(self, index):
+        return (self.id, self.name, self.age, self.grade)[index]
+
+    def __len__(self):
+        return 4
+
+    def __eq__(self, other):
+        if isinstance(other, (Student, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f"Student(id={self.id!r}, name={self.name!r}, age={self.age!r}, grade={self.grade!r})"
+
+
+
+
+class StudentColumns:
+    # Column-oriented copy of many students for analytics: ids as
+    # array('q') and ages as array('h') take 8 and 2 bytes per row.
+    # Missing ages are stored as MISSING_AGE.
+    MISSING_AGE = -1
+    __slots__ = ("ids", "names", "ages", "grades")
+
+    def __init__(self, rows = ()):
+        self.ids = array('q')
+        self.names = []
+        self.ages = array('h')
+        self.grades = []
+        self.extend(rows)
+
+
+
+    def extend(self, rows):
+        for student_id, name, age, grade in rows:
+            self.ids.append(student_id)
+            self.names.append(name)
+            self.ages.append(self.MISSING_AGE if age is None else age)
+            self.grades.append(grade)
+
+
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,129 @@
+import string
+import pandas as pd
+from importer import REQUIRED_COLUMNS, MIN_AGE, MAX_AGE
+
+# Letter grades, for callers that want to restrict uploads to them. Not
+# enforced by default: Add/Update Student accept any grade, and existing
+# data holds numeric ones, so uploads would reject the app's own exports.
+VALID_GRADES = ("A+", "A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D+", "D", "D-", "F")
+# Folds case the way SQLite's NOCASE does (ASCII letters only), so rows
+# repeated within a file and rows matching the database by
+# Database.match_existing are judged alike: "Émile" and "émile" differ in
+# both.
+NOCASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class UploadValidator:
+    # Checks a whole chunk of uploaded rows at once with column operations
+    # instead of row by row. split() takes a DataFrame with Name, Age and
+    # Grade columns, indexed by CSV line number, and returns the accepted
+    # rows (normalised, ready to insert) and the rejected rows (original
+    # values plus an Error column). valid_grades, if given, is the only
+    # grades accepted.
+    def __init__(self, database = None, valid_grades = None, min_age = MIN_AGE, max_age = MAX_AGE):
+        self.db = database
+        self.valid_grades = valid_grades
+        self.min_age = min_age
+        self.max_age = max_age
+
+
+
+    def normalize(self, frame):
+        # Names: surrounding whitespace dropped and inner runs collapsed to
+        # one space. Grades: trimmed and upper-cased.
+        name = frame['Name'].fillna('').astype(str).str.strip().str.replace(r'\s+', ' ', regex = True)
+        grade = frame['Grade'].fillna('').astype(str).str.strip().str.upper()
+        age_text = frame['Age'].fillna('').astype(str).str.strip()
+        return name, age_text, grade
+
+
+
+    def split(self, frame):
+        name, age_text, grade = self.normalize(frame)
+        age = pd.to_numeric(age_text, errors = 'coerce')
+        whole = age.notna() & (age % 1 == 0)
+
+        # Checked in order; a row is reported with the first check it fails.
+        # Messages are formatted only for the rows that fail.
+        checks = [
+            (name == '', "missing Name", None),
+            (grade == '', "missing Grade", None),
+            (age_text == '', "missing Age", None),
+            (age.isna(), "Age '{}' is not a number", age_text),
+            (~whole, "Age '{}' is not a whole number", age_text),
+            ((age < self.min_age) | (age > self.max_age),
+             "Age {} is outside " + f"{self.min_age}-{self.max_age}", age_text),
+        ]
+        if self.valid_grades is not None:
+            checks.append((~grade.isin(self.valid_grades),
+                           "Grade '{}' is not one of " + ", ".join(self.valid_grades), grade))
+
+        error = pd.Series(None, index = frame.index, dtype = object)
+        for mask, message, values in checks:
+            failed = mask & error.isna()
+            if failed.any():
+                error[failed] = message if values is None else values[failed].map(message.format)
+
+        valid = error.isna()
+        key = pd.DataFrame({
+            'Name': name.str.translate(NOCASE),
+            'Age': age.where(valid).astype('Int64'),
+            'Grade': grade,
+        })
+        repeated = key[valid].duplicated(keep = 'first').reindex(frame.index, fill_value = False)
+        error = error.mask(repeated, "duplicate of an earlier row in this file")
+        valid &= ~repeated
+
+        if self.db is not None and valid.any():
+            candidates = key[valid]
+            positions = self.db.match_existing(zip(name[valid].tolist(), candidates['Age'].astype(int).tolist(),
+                                                   candidates['Grade'].tolist()))
+            existing = pd.Series(frame.index.isin(candidates.index[positions]), index = frame.index)
+            error = error.mask(existing, "already in the database")
+            valid &= ~existing
+
+        accepted = pd.DataFrame({'Name': name, 'Age': age, 'Grade': grade})[valid]
+        accepted['Age'] = accepted['Age'].astype(int)
+        rejected = frame[~valid].assign(Error = error[~valid])
+        return accepted, rejected
+
+
+
+    def read_frames(self, source, chunk_size = 5000):
+        # Reads the CSV with pandas' C parser in DataFrames of chunk_size
+        # rows, all values as text, indexed by line number. Blank lines are
+        # dropped after numbering, as csv.DictReader does.
+        frames = pd.read_csv(source, dtype = str, keep_default_na = False, skip_blank_lines = False,
+                             encoding = 'utf-8-sig', chunksize = chunk_size)
+        start = 2
+        for frame in frames:
+            missing = [col for col in REQUIRED_COLUMNS if col not in frame.columns]
+            if missing:
+                raise ValueError(f"CSV must contain columns: {', '.join(REQUIRED_COLUMNS)}. "
+                                 f"Found: {', '.join(map(str, frame.columns))}")
+            frame.index = pd.RangeIndex(start, start + len(frame))
+            start += len(frame)
+            yield frame[(frame != '').any(axis = 1)]
+
+
+
+    def validate_frame(self, frame):
+        # CSVImporter's interface: returns ([(line_no, name, age, grade)],
+        # [(line_no, row, message)]) for a frame indexed by line number.
+        # Within a chunk a repeated row is reported as an in-file duplicate;
+        # across chunks the first copy is already inserted, so the repeat is
+        # reported as already in the database.
+        accepted, rejected = self.split(frame)
+        valid = list(zip(accepted.index.tolist(), accepted['Name'].tolist(),
+                         accepted['Age'].tolist(), accepted['Grade'].tolist()))
+        invalid = list(zip(rejected.index.tolist(), rejected[REQUIRED_COLUMNS].to_dict('records'),
+                           rejected['Error'].tolist()))
+        return valid, invalid
+
+
+
+    def validate_rows(self, rows):
+        # Same as validate_frame for rows already parsed into dicts.
+        rows = list(rows)
+        return self.validate_frame(pd.DataFrame.from_records(
+            [row for _, row in rows], columns = REQUIRED_COLUMNS, index = [line_no for line_no, _ in rows]))